@@ -4,20 +4,115 @@ from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipe
 from PIL import Image
 import torch
 import torch.nn.functional as F
-import requests
-from io import BytesIO
+import os
+import threading
+import time
+import image_fetcher
+import image_hash
+import profiling
+from src.metrics import MODEL_BATCH_SIZE, MODEL_FORWARD_SECONDS, TOKENIZE_SECONDS
 
-image_detector = pipeline("image-classification", model="Organika/sdxl-detector")
+IMAGE_MODEL_NAME = "Organika/sdxl-detector"
 
 MODELS = {
     "openai-roberta": {"name": "openai-community/roberta-base-openai-detector", "weight": 1.0},
     "chatgpt-roberta": {"name": "Hello-SimpleAI/chatgpt-detector-roberta", "weight": 0.7}
 }
 
-loaded_models = {k: {"tokenizer": AutoTokenizer.from_pretrained(v["name"]),
-                     "model": AutoModelForSequenceClassification.from_pretrained(v["name"]),
-                     "weight": v["weight"]}
-                 for k, v in MODELS.items()}
+# Caption ensemble inference backend:
+#   "fp32" - stock PyTorch weights
+#   "int8" - PyTorch dynamic int8 quantization of the Linear layers (CPU)
+#   "onnx" - ONNX Runtime export via optimum (pip install optimum[onnxruntime])
+CAPTION_BACKENDS = ("fp32", "int8", "onnx")
+CAPTION_BACKEND = os.getenv("SLOPCHOP_CAPTION_BACKEND", "fp32").lower()
+if CAPTION_BACKEND not in CAPTION_BACKENDS:
+    raise ValueError(f"SLOPCHOP_CAPTION_BACKEND must be one of {CAPTION_BACKENDS}, got {CAPTION_BACKEND!r}")
+
+# Early-exit cascade: run CASCADE_FIRST alone and only run the rest of the
+# ensemble for captions whose probability falls inside CASCADE_BAND (percent)
+CASCADE_ENABLED = os.getenv("SLOPCHOP_CAPTION_CASCADE", "0") == "1"
+CASCADE_FIRST = os.getenv("SLOPCHOP_CASCADE_FIRST", "openai-roberta")
+CASCADE_BAND = tuple(float(x) for x in os.getenv("SLOPCHOP_CASCADE_BAND", "10,90").split(","))
+if CASCADE_FIRST not in MODELS:
+    raise ValueError(f"SLOPCHOP_CASCADE_FIRST must be one of {list(MODELS)}, got {CASCADE_FIRST!r}")
+
+# Bump when scoring logic changes so persisted scores get recomputed
+SCORE_VERSION = 1
+CAPTION_MODEL_VERSION = f"v{SCORE_VERSION}:{CAPTION_BACKEND}:" + ",".join(f"{v['name']}*{v['weight']}" for v in MODELS.values())
+if CASCADE_ENABLED:
+    CAPTION_MODEL_VERSION += f":cascade={CASCADE_FIRST}@{CASCADE_BAND[0]:g}-{CASCADE_BAND[1]:g}"
+IMAGE_MODEL_VERSION = f"v{SCORE_VERSION}:{IMAGE_MODEL_NAME}:{image_fetcher.IMAGE_FETCH_MODE}"
+
+# Models are loaded on first use (or by warm_up), never at import time
+_load_lock = threading.Lock()
+_image_detector = None
+_loaded_models = {}
+_readiness = {"state": "cold", "error": None, "warmup_seconds": None}
+
+def get_image_detector():
+    global _image_detector
+    if _image_detector is None:
+        with _load_lock:
+            if _image_detector is None:
+                _image_detector = pipeline("image-classification", model=IMAGE_MODEL_NAME)
+    return _image_detector
+
+def _load_caption_model(name: str, backend: str):
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+            raise ImportError("The onnx caption backend needs `pip install optimum[onnxruntime]`") from e
+        return ORTModelForSequenceClassification.from_pretrained(name, export=True)
+
+    model = AutoModelForSequenceClassification.from_pretrained(name)
+    if backend == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+def get_loaded_models(backend: Optional[str] = None) -> dict:
+    """Caption ensemble for `backend` (default: CAPTION_BACKEND), loaded once per backend."""
+    backend = backend or CAPTION_BACKEND
+    if backend not in _loaded_models:
+        with _load_lock:
+            if backend not in _loaded_models:
+                _loaded_models[backend] = {k: {"tokenizer": AutoTokenizer.from_pretrained(v["name"]),
+                                               "model": _load_caption_model(v["name"], backend),
+                                               "weight": v["weight"]}
+                                           for k, v in MODELS.items()}
+    return _loaded_models[backend]
+
+def __getattr__(name):
+    # Keep `ai_engine.loaded_models` / `ai_engine.image_detector` working, lazily
+    if name == "loaded_models":
+        return get_loaded_models()
+    if name == "image_detector":
+        return get_image_detector()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warm_up() -> None:
+    """
+    Load every model and run one dummy forward pass through each so weights,
+    allocator pools and lazy kernels are in place before real traffic arrives.
+    """
+    _readiness["state"] = "loading"
+    started = time.time()
+    try:
+        get_loaded_models()
+        get_image_detector()
+        scan_post_captions(["warm up"])
+        classify_images([Image.new("RGB", (224, 224))])
+    except Exception as e:
+        _readiness.update(state="failed", error=str(e))
+        print(f"Model warm-up failed: {e}")
+        return
+    _readiness.update(state="ready", error=None, warmup_seconds=round(time.time() - started, 2))
+
+def is_ready() -> bool:
+    return _readiness["state"] == "ready"
+
+def readiness() -> dict:
+    return dict(_readiness)
 
 # Data format for the post
 class ModelInput(BaseModel):
@@ -25,36 +120,151 @@ class ModelInput(BaseModel):
     caption: str
     image_url: str
 
+# Images per detector forward pass
+IMAGE_BATCH_SIZE = 8
+
+# Captions per forward pass; captions are length-bucketed so padding stays small
+CAPTION_BATCH_SIZE = 16
+
 # 3. Hugging Face Workspace
-def scan_post_caption(input_data: str) -> int:
-    total, weight_sum = 0, 0
-    for info in loaded_models.values():
-        inputs = info["tokenizer"](input_data, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            logits = info["model"](**inputs).logits
-            if logits.shape[-1] == 2:
-                ai_prob = F.softmax(logits, dim=-1)[0][1].item() * 100
-            else:
-                ai_prob = torch.sigmoid(logits[0][0]).item() * 100
-        total += ai_prob * info["weight"]
+def _ai_probs_from_logits(logits: torch.Tensor) -> List[float]:
+    if logits.shape[-1] == 2:
+        return (F.softmax(logits, dim=-1)[:, 1] * 100).tolist()
+    return (torch.sigmoid(logits[:, 0]) * 100).tolist()
+
+def _model_caption_probs(key: str, info: dict, captions: List[str]) -> List[float]:
+    """
+    Run one model over many captions. Captions are tokenized once, sorted by
+    token length and padded per batch, then scattered back to input order.
+    """
+    tokenizer = info["tokenizer"]
+    with TOKENIZE_SECONDS.labels(key).time():
+        encoded = tokenizer(captions, truncation=True, max_length=512)
+    order = sorted(range(len(captions)), key=lambda i: len(encoded["input_ids"][i]))
+
+    probs: List[float] = [0.0] * len(captions)
+    for start in range(0, len(order), CAPTION_BATCH_SIZE):
+        chunk = order[start:start + CAPTION_BATCH_SIZE]
+        batch = tokenizer.pad(
+            [{k: encoded[k][i] for k in encoded.keys()} for i in chunk],
+            return_tensors="pt",
+        )
+        MODEL_BATCH_SIZE.labels(key).observe(len(chunk))
+        with torch.no_grad(), MODEL_FORWARD_SECONDS.labels(key).time(), profiling.torch_ops(key):
+            logits = info["model"](**batch).logits
+        for i, p in zip(chunk, _ai_probs_from_logits(logits)):
+            probs[i] = p
+    return probs
+
+_cascade_lock = threading.Lock()
+_cascade_stats = {"captions": 0, "first_model_only": 0, "full_ensemble": 0}
+
+def _scan_cascade(models: dict, captions: List[str]) -> List[float]:
+    first = models[CASCADE_FIRST]
+    first_probs = _model_caption_probs(CASCADE_FIRST, first, captions)
+    low, high = CASCADE_BAND
+    uncertain = [i for i, p in enumerate(first_probs) if low <= p <= high]
+
+    scores = [round(p, 1) for p in first_probs]
+    if uncertain:
+        subset = [captions[i] for i in uncertain]
+        totals = [first_probs[i] * first["weight"] for i in uncertain]
+        weight_sum = first["weight"]
+        for key, info in models.items():
+            if key == CASCADE_FIRST:
+                continue
+            for j, p in enumerate(_model_caption_probs(key, info, subset)):
+                totals[j] += p * info["weight"]
+            weight_sum += info["weight"]
+        for i, t in zip(uncertain, totals):
+            scores[i] = round(t / weight_sum, 1)
+
+    with _cascade_lock:
+        _cascade_stats["captions"] += len(captions)
+        _cascade_stats["first_model_only"] += len(captions) - len(uncertain)
+        _cascade_stats["full_ensemble"] += len(uncertain)
+    return scores
+
+def cascade_stats() -> dict:
+    """How often the cascade exited after the first model vs ran the full ensemble."""
+    with _cascade_lock:
+        stats = dict(_cascade_stats)
+    stats["enabled"] = CASCADE_ENABLED
+    stats["first_model"] = CASCADE_FIRST
+    stats["band"] = list(CASCADE_BAND)
+    stats["early_exit_rate"] = round(stats["first_model_only"] / stats["captions"], 4) if stats["captions"] else 0.0
+    return stats
+
+def scan_post_captions(captions: List[str], backend: Optional[str] = None) -> List[float]:
+    """Batched scan_post_caption: one weighted ensemble score per caption, in order."""
+    if not captions:
+        return []
+    models = get_loaded_models(backend)
+    if CASCADE_ENABLED:
+        return _scan_cascade(models, captions)
+    totals = [0.0] * len(captions)
+    weight_sum = 0
+    for key, info in models.items():
+        for i, p in enumerate(_model_caption_probs(key, info, captions)):
+            totals[i] += p * info["weight"]
         weight_sum += info["weight"]
-    return round(total / weight_sum, 1)
+    return [round(t / weight_sum, 1) for t in totals]
 
-def get_ai_image_probability(img_url: str) -> float:
+def scan_post_caption(input_data: str) -> int:
+    return scan_post_captions([input_data])[0]
+
+def _ai_label_score(results: List[dict]) -> float:
+    for r in results:
+        if r["label"].lower() in ["artificial", "ai", "generated"]:
+            return round(r["score"], 4)
+    return 0.0
+
+def classify_images(images: List[Image.Image]) -> List[float]:
+    """Run the image detector over already-decoded images as one batch."""
+    if not images:
+        return []
+    detector = get_image_detector()
+    MODEL_BATCH_SIZE.labels("image-detector").observe(len(images))
+    with MODEL_FORWARD_SECONDS.labels("image-detector").time(), profiling.torch_ops("image-detector"):
+        results = detector(images, batch_size=IMAGE_BATCH_SIZE)
+    return [_ai_label_score(r) for r in results]
+
+def get_ai_image_probabilities(img_urls: List[str], default: Optional[float] = 0.0) -> List[Optional[float]]:
+    """
+    Download every image concurrently, then classify all decoded images in one
+    batch. Images perceptually identical to an already classified one reuse
+    its probability. Images that fail to download or classify get `default`.
+    """
+    images = image_fetcher.fetch_images(img_urls)
+    probs = [default] * len(img_urls)
+
+    # Perceptual-hash lookup; repeats of one picture within the batch classify once
+    to_classify = {}
+    for i, img in enumerate(images):
+        if img is None:
+            continue
+        h = image_hash.dhash(img) if image_hash.PHASH_ENABLED else None
+        if h is None or not image_hash.is_informative(h):
+            to_classify[("url", i)] = [i]
+            continue
+        cached = image_hash.index.lookup(h)
+        if cached is not None:
+            probs[i] = cached
+        else:
+            to_classify.setdefault(("hash", h), []).append(i)
+
+    keys = list(to_classify)
     try:
-        response = requests.get(img_url, timeout=10)
-        response.raise_for_status()
-        
-        img = Image.open(BytesIO(response.content)).convert("RGB")
-        
-        results = image_detector(img)
-        
-        for r in results:
-            if r["label"].lower() in ["artificial", "ai", "generated"]:
-                return round(r["score"], 4)
-        
-        return 0.0
-        
+        results = classify_images([images[to_classify[k][0]] for k in keys])
     except Exception as e:
-        print(f"Error processing image {img_url}: {e}")
-        return 0.0
\ No newline at end of file
+        print(f"Error classifying {len(keys)} images: {e}")
+        return probs
+    for key, p in zip(keys, results):
+        if key[0] == "hash":
+            image_hash.index.add(key[1], p)
+        for i in to_classify[key]:
+            probs[i] = p
+    return probs
+
+def get_ai_image_probability(img_url: str) -> float:
+    return get_ai_image_probabilities([img_url])[0]
@@ -0,0 +1,13 @@
+"""
+Offline benchmark suite for the scoring and trend pipelines.
+
+Everything the pipelines talk to over the network is replaced by local
+stand-ins: an HTTP server for the Trends RSS, the Census geocoder and image
+hosts (bench.fakes), and a tweepy-compatible search client. Captions, images
+and tweets come from a seeded synthetic corpus (bench.corpus), so runs are
+reproducible and results can be diffed between commits.
+
+Usage (from backend/):
+    python -m bench --models stub --output bench-results.json
+    python -m bench --compare old.json --output new.json
+"""
@@ -0,0 +1,130 @@
+"""
+Seeded synthetic corpus: captions, images, trend topics and tweets.
+
+Captions mix scam templates (giveaways, crypto doubling, fake support) with
+ordinary posts, with random names, amounts, mentions and links so the
+near-duplicate index sees realistic variation. Images are JPEGs with
+gradients, shapes and noise at a configurable size, so they decode, hash and
+classify like real photos rather than flat placeholders.
+"""
+from __future__ import annotations
+
+import random
+from io import BytesIO
+from typing import Any, Dict, List
+
+from PIL import Image, ImageDraw
+
+_SCAM_TEMPLATES = [
+    "URGENT: Doubling all {coin} sent to my wallet! Link in bio {link} Spots sell out fast! #crypto #giveaway",
+    "{name} is giving away ${amount} to the first {count} followers. DM @{handle} now to claim {link}",
+    "Your account has been flagged. Verify within 24h or it will be suspended: {link} - {name} Support",
+    "I turned ${amount} into ${amount2} in {count} days with this {coin} bot. Message @{handle} to learn how",
+    "Congratulations! You won a {prize}. Pay the ${amount} shipping fee here {link} #winner",
+]
+_HUMAN_TEMPLATES = [
+    "Had the best {food} at {place} today with @{handle}, highly recommend",
+    "{team} looked sharp tonight. That {play} in the {period} was unreal",
+    "Traffic on {road} is backed up for miles, leave early if you can",
+    "Finally finished {book}. The ending was not what I expected at all",
+    "Morning run along the {place} trail, {count} miles before work",
+    "New blog post about {topic} is up, thoughts welcome {link}",
+]
+_WORDS = {
+    "coin": ["BTC", "ETH", "SOL", "DOGE", "USDT"],
+    "name": ["Elon", "MrBeast", "Taylor", "Microsoft", "Apple", "Amazon", "PayPal"],
+    "prize": ["iPhone 16", "PS5", "Tesla Model 3", "$1000 gift card"],
+    "food": ["ramen", "tacos", "pizza", "bbq", "pho"],
+    "place": ["downtown", "the river", "Lake Johnson", "the old mill", "Centennial park"],
+    "team": ["The Wolfpack", "Carolina", "The Lakers", "Arsenal", "The Yankees"],
+    "play": ["block", "three pointer", "double play", "free kick", "pick six"],
+    "period": ["first half", "fourth quarter", "ninth", "overtime"],
+    "road": ["I-40", "US-1", "the beltline", "Capital Blvd"],
+    "book": ["Dune", "Project Hail Mary", "the new Sanderson", "Piranesi"],
+    "topic": ["home networking", "sourdough", "Rust lifetimes", "budget travel"],
+}
+_TOPICS = [
+    "Taylor Swift", "Lakers", "NC State", "hurricane", "Apple event", "SpaceX launch", "World Series",
+    "election polls", "NBA draft", "Super Bowl", "Bitcoin price", "Netflix", "Olympics", "Premier League",
+    "stock market", "iPhone", "Grammys", "weather", "Formula 1", "college football",
+]
+
+
+class Corpus:
+    """
+    Deterministic generator for benchmark inputs.
+
+    Args:
+        seed: RNG seed; the same seed always yields the same corpus.
+        scam_ratio: Fraction of captions drawn from scam templates.
+    """
+
+    def __init__(self, seed: int = 2026, scam_ratio: float = 0.3) -> None:
+        self.seed = seed
+        self.scam_ratio = scam_ratio
+
+    def _fill(self, rng: random.Random, template: str) -> str:
+        values = {k: rng.choice(v) for k, v in _WORDS.items()}
+        values.update(
+            amount=rng.randint(50, 5000),
+            amount2=rng.randint(10_000, 90_000),
+            count=rng.randint(2, 500),
+            handle=f"user{rng.randint(1000, 99999)}",
+            link=f"https://t.co/{rng.getrandbits(40):010x}",
+        )
+        return template.format(**values)
+
+    def captions(self, n: int) -> List[str]:
+        rng = random.Random(self.seed)
+        out = []
+        for _ in range(n):
+            templates = _SCAM_TEMPLATES if rng.random() < self.scam_ratio else _HUMAN_TEMPLATES
+            out.append(self._fill(rng, rng.choice(templates)))
+        return out
+
+    def topics(self, n: int) -> List[str]:
+        base = list(_TOPICS)
+        return [base[i % len(base)] + ("" if i < len(base) else f" {i // len(base) + 1}") for i in range(n)]
+
+    def image_bytes(self, index: int, size: int = 512) -> bytes:
+        """A size x size JPEG that is unique per `index`."""
+        rng = random.Random(self.seed * 1_000_003 + index)
+        img = Image.new("RGB", (size, size))
+        draw = ImageDraw.Draw(img)
+        c1 = [rng.randint(0, 255) for _ in range(3)]
+        c2 = [rng.randint(0, 255) for _ in range(3)]
+        for y in range(0, size, 4):
+            t = y / size
+            color = tuple(int(a + (b - a) * t) for a, b in zip(c1, c2))
+            draw.rectangle([0, y, size, y + 4], fill=color)
+        for _ in range(12):
+            x0, y0 = rng.randint(0, size), rng.randint(0, size)
+            r = rng.randint(size // 20, size // 4)
+            fill = tuple(rng.randint(0, 255) for _ in range(3))
+            if rng.random() < 0.5:
+                draw.ellipse([x0 - r, y0 - r, x0 + r, y0 + r], fill=fill)
+            else:
+                draw.rectangle([x0 - r, y0 - r, x0 + r, y0 + r], fill=fill)
+        noise = Image.effect_noise((size, size), 24).convert("RGB")
+        img = Image.blend(img, noise, 0.15)
+        buf = BytesIO()
+        img.save(buf, "JPEG", quality=85)
+        return buf.getvalue()
+
+    def tweets(self, topics: List[str], per_topic: int, image_base_url: str) -> List[Dict[str, Any]]:
+        """`per_topic` media tweets mentioning each topic, with images on `image_base_url`."""
+        rng = random.Random(self.seed + 7)
+        captions = self.captions(len(topics) * per_topic)
+        out = []
+        for i, caption in enumerate(captions):
+            topic = topics[i // per_topic]
+            out.append(
+                {
+                    "id": str(10**18 + i),
+                    "text": f"{topic}: {caption}" if rng.random() < 0.5 else f"{caption} #{topic.replace(' ', '')}",
+                    "author_id": str(1000 + i % 50),
+                    "likes": rng.randint(0, 5000),
+                    "image_url": f"{image_base_url}/img/{i}.jpg",
+                }
+            )
+        return out
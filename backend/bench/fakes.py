@@ -0,0 +1,191 @@
+"""
+Local stand-ins for the services the pipelines call.
+
+FakeServer is a threaded HTTP server on 127.0.0.1 serving:
+    /trending/rss?geo=XX   Google Trends style RSS (with ETag / 304 support)
+    /census?x=..&y=..      Census geocoder style JSON ("US" inside a box)
+    /img/<n>.jpg           corpus JPEGs, generated once and kept in memory
+
+FakeXClient answers `search_recent_tweets` like tweepy's Client, from the
+corpus tweets whose text mentions the query terms. Both take an optional
+artificial latency so network-bound stages can be modelled.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import tweepy as tw
+
+from bench.corpus import Corpus
+
+
+class FakeServer:
+    """
+    Args:
+        corpus: Source of topics and images.
+        topics: Trend titles served for every geo.
+        image_size: Edge length of served images in pixels.
+        latency_s: Delay added to every response.
+    """
+
+    def __init__(self, corpus: Corpus, topics: List[str], image_size: int = 512, latency_s: float = 0.0) -> None:
+        self.corpus = corpus
+        self.topics = topics
+        self.image_size = image_size
+        self.latency_s = latency_s
+        self._images: Dict[int, bytes] = {}
+        self._images_lock = threading.Lock()
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="bench-fake-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def image(self, index: int) -> bytes:
+        with self._images_lock:
+            data = self._images.get(index)
+        if data is None:
+            data = self.corpus.image_bytes(index, self.image_size)
+            with self._images_lock:
+                self._images[index] = data
+        return data
+
+    def rss(self, geo: str) -> bytes:
+        items = "".join(
+            f"<item><title>{escape(t)}</title><link>https://trends.google.com/{i}</link>"
+            f"<pubDate>Sat, 18 Oct 2026 12:00:00 +0000</pubDate><ht:approx_traffic>{(i + 1) * 1000}+</ht:approx_traffic></item>"
+            for i, t in enumerate(self.topics)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<rss version="2.0" xmlns:ht="https://trends.google.com/trending/rss"><channel>'
+            f"<title>Daily Search Trends {escape(geo)}</title><lastBuildDate>Sat, 18 Oct 2026 12:00:00 +0000</lastBuildDate>"
+            f"{items}</channel></rss>"
+        ).encode("utf-8")
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                server.requests += 1
+                if server.latency_s:
+                    time.sleep(server.latency_s)
+                parts = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+                if parts.path == "/trending/rss":
+                    body = server.rss(query.get("geo", "US"))
+                    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self._send(304, b"", "application/rss+xml", {"ETag": etag})
+                    else:
+                        self._send(200, body, "application/rss+xml", {"ETag": etag})
+                elif parts.path == "/census":
+                    x, y = float(query.get("x", 0)), float(query.get("y", 0))
+                    inside = -125 <= x <= -66 and 24 <= y <= 50
+                    states = [{"NAME": "North Carolina", "STUSAB": "NC"}] if inside else []
+                    body = json.dumps({"result": {"geographies": {"States": states}}}).encode("utf-8")
+                    self._send(200, body, "application/json")
+                else:
+                    m = re.fullmatch(r"/img/(\d+)\.jpg", parts.path)
+                    if m:
+                        self._send(200, server.image(int(m.group(1))), "image/jpeg")
+                    else:
+                        self._send(404, b"not found", "text/plain")
+
+        return Handler
+
+
+class FakeXClient:
+    """
+    tweepy.Client stand-in for `search_recent_tweets`.
+
+    A tweet matches a query when its text contains any of the query's
+    search terms (quoted phrases or bare words; operators are ignored).
+    Responses are built from tweepy's own Response / Tweet / Media / User
+    types, so xapi parses them exactly as it parses real API responses.
+    """
+
+    _TERM_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+    def __init__(self, tweets: List[Dict[str, Any]], latency_s: float = 0.0) -> None:
+        self.tweets = tweets
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _terms(self, query: str) -> List[str]:
+        terms = []
+        for phrase, word in self._TERM_RE.findall(query):
+            term = (phrase or word).strip("()").lower()
+            if not term or term == "or" or ":" in term or term.startswith("-"):
+                continue
+            terms.append(term)
+        return terms
+
+    def search_recent_tweets(self, query: str, max_results: int = 10, **kwargs: Any) -> tw.Response:
+        with self._lock:
+            self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        terms = self._terms(query)
+        data, media, users = [], [], {}
+        for t in self.tweets:
+            text = t["text"].lower()
+            if not any(term in text or term.replace(" ", "") in text for term in terms):
+                continue
+            key = f"3_{t['id']}"
+            data.append(
+                tw.Tweet({
+                    "id": t["id"],
+                    "edit_history_tweet_ids": [t["id"]],
+                    "text": t["text"],
+                    "author_id": t["author_id"],
+                    "lang": "en",
+                    "attachments": {"media_keys": [key]},
+                    "public_metrics": {"like_count": t["likes"]},
+                })
+            )
+            media.append(tw.Media({"media_key": key, "type": "photo", "url": t["image_url"]}))
+            users[t["author_id"]] = tw.User(
+                {"id": t["author_id"], "username": f"bench_{t['author_id']}", "name": t["author_id"]}
+            )
+            if len(data) >= max_results:
+                break
+        includes = {"media": media, "users": list(users.values())}
+        return tw.Response(data or None, includes, [], {"result_count": len(data)})
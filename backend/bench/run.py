@@ -0,0 +1,347 @@
+"""
+Benchmark runner: `python -m bench` from backend/.
+
+Stages (each reported cold and warm; cold clears every TTLCache, the feed
+snapshot and the near-duplicate / perceptual-hash indexes first):
+    scan_post_caption                    one caption per call, straight to ai_engine
+    scan_post_captions_batch             the whole caption corpus in one call
+    get_ai_image_probability             one image URL per call (download, decode, classify)
+    generate_analyzed_feed               the mock feed, replaced by a synthetic one
+    get_posts_from_trends_as_real_tweets Trends RSS -> X search -> scoring, end to end
+    get_trends                           RSS fetch (cold) / revalidation-free cache hit (warm)
+    coords_to_geo                        offline geocoder lookups
+    census_lookup                        Census geocoder round trip (the fallback path)
+
+Results are written as JSON with sorted keys so two runs diff cleanly;
+`--compare` prints p50/p95 changes against an earlier result file.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from PIL import Image
+
+# Everything the benchmark must not share with a real deployment: persistent
+# score / variant files, background threads, and randomised exploration.
+for _name, _value in {
+    "SLOPCHOP_SCORE_DB": "off",
+    "SLOPCHOP_VARIANT_STATS": "off",
+    "SLOPCHOP_VARIANT_EXPLORE_RATE": "0",
+    "SLOPCHOP_GEOCODER_CENSUS_FALLBACK": "1",
+    "SLOPCHOP_PREFETCH": "0",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from bench.corpus import Corpus  # noqa: E402
+from bench.fakes import FakeServer, FakeXClient  # noqa: E402
+
+RESULT_VERSION = 1
+
+
+def summarize(latencies_s: Sequence[float], items: Optional[int] = None) -> Dict[str, Any]:
+    """Count, mean and nearest-rank p50/p95/p99 in ms, plus items per second over the whole run."""
+    if not latencies_s:
+        return {"count": 0}
+    ordered = sorted(latencies_s)
+
+    def pct(p: float) -> float:
+        rank = max(1, -(-len(ordered) * p // 100))  # ceil, nearest-rank
+        return round(ordered[int(rank) - 1] * 1000, 3)
+
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "total_s": round(total, 4),
+        "throughput_per_s": round((items if items is not None else len(ordered)) / total, 3) if total else None,
+    }
+
+
+def _time_each(fn: Callable[[Any], Any], inputs: Sequence[Any]) -> List[float]:
+    out = []
+    for item in inputs:
+        started = time.perf_counter()
+        fn(item)
+        out.append(time.perf_counter() - started)
+    return out
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+class Bench:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.corpus = Corpus(seed=args.seed)
+        self.topics = self.corpus.topics(args.topics)
+
+        if args.models == "stub":
+            from bench import stub_models
+
+            stub_models.install()
+
+        self.server = FakeServer(self.corpus, self.topics, image_size=args.image_size, latency_s=args.net_latency_ms / 1000)
+        self.server.start()
+        base = self.server.base_url
+
+        import ai_engine
+        import caption_dedup
+        import feed_service
+        import image_hash
+        import query_variants
+        from src import cache, googleapi, trends, xapi
+
+        self.ai_engine = ai_engine
+        self.caption_dedup = caption_dedup
+        self.feed_service = feed_service
+        self.image_hash = image_hash
+        self.query_variants = query_variants
+        self.cache = cache
+        self.googleapi = googleapi
+        self.trends = trends
+        self.xapi = xapi
+
+        trends.TRENDS_RSS_URL = f"{base}/trending/rss"
+        googleapi.CENSUS_GEOCODER_URL = f"{base}/census"
+        self.x_client = FakeXClient(
+            self.corpus.tweets(self.topics, args.tweets_per_topic, base), latency_s=args.x_latency_ms / 1000
+        )
+        xapi.client_v2 = self.x_client
+
+        captions = self.corpus.captions(args.feed_posts)
+        offset = 1_000_000  # keep feed images apart from tweet images
+        self.feed_posts = [
+            {
+                "id": f"bench_{i}",
+                "username": f"bench_user_{i % 17}",
+                "image_url": f"{base}/img/{offset + i}.jpg",
+                "caption": caption,
+                "likes": i * 37 % 5000,
+                "risk_score": 0,
+                "ai_image_probability": 0.0,
+                "flag": "Pending",
+            }
+            for i, caption in enumerate(captions)
+        ]
+        feed_service.get_mock_feed = self._mock_feed
+
+    def _mock_feed(self) -> Dict[str, Any]:
+        posts = [dict(p) for p in self.feed_posts]
+        return {"geo": "US", "updated": None, "count": len(posts), "posts": posts}
+
+    def reset(self) -> None:
+        """Forget every cached score, feed, trend list and tweet: the next call runs cold."""
+        with self.cache._REGISTRY_LOCK:
+            caches = list(self.cache._REGISTRY.values())
+        for c in caches:
+            c.clear()
+        self.feed_service._snapshot = None
+        self.feed_service._failed_builds = 0
+        self.caption_dedup.index = self.caption_dedup.NearDuplicateIndex()
+        self.image_hash.index = self.image_hash.PerceptualHashIndex()
+        self.query_variants.stats = self.query_variants.VariantStats(None)
+
+    def _cold_and_warm(self, fn: Callable[[], Any]) -> Dict[str, Any]:
+        cold = []
+        for _ in range(self.args.repeat):
+            self.reset()
+            started = time.perf_counter()
+            fn()
+            cold.append(time.perf_counter() - started)
+        warm = _time_each(lambda _: fn(), range(self.args.repeat))
+        return {"cold": summarize(cold), "warm": summarize(warm)}
+
+    def stage_scan_post_caption(self) -> Dict[str, Any]:
+        captions = self.corpus.captions(self.args.captions)
+        self.reset()
+        self.ai_engine.scan_post_caption("warm up")  # model load is not part of the measurement
+        return {"cold": summarize(_time_each(self.ai_engine.scan_post_caption, captions))}
+
+    def stage_scan_post_captions_batch(self) -> Dict[str, Any]:
+        captions = self.corpus.captions(self.args.captions)
+        latencies = _time_each(lambda _: self.ai_engine.scan_post_captions(captions), range(self.args.repeat))
+        return {"cold": summarize(latencies, items=len(captions) * len(latencies))}
+
+    def stage_get_ai_image_probability(self) -> Dict[str, Any]:
+        base = self.server.base_url
+        urls = [f"{base}/img/{2_000_000 + i}.jpg" for i in range(self.args.images)]
+        for i in range(self.args.images):
+            self.server.image(2_000_000 + i)  # encode up front, outside the timing
+        self.reset()
+        self.ai_engine.classify_images([Image.open(BytesIO(self.server.image(2_000_000))).convert("RGB")])
+        cold = _time_each(self.ai_engine.get_ai_image_probability, urls)
+        warm = _time_each(self.ai_engine.get_ai_image_probability, urls)
+        return {"cold": summarize(cold), "warm": summarize(warm)}
+
+    def stage_generate_analyzed_feed(self) -> Dict[str, Any]:
+        for i in range(len(self.feed_posts)):
+            self.server.image(1_000_000 + i)
+        return self._cold_and_warm(self.feed_service.generate_analyzed_feed)
+
+    def stage_get_posts_from_trends_as_real_tweets(self) -> Dict[str, Any]:
+        for i in range(len(self.x_client.tweets)):
+            self.server.image(i)
+        calls_before = self.x_client.calls
+        result = self._cold_and_warm(
+            lambda: self.xapi.get_posts_from_trends_as_real_tweets(
+                geo="US", trends_count=self.args.topics, tweets_per_trend=self.args.tweets_per_topic
+            )
+        )
+        result["x_calls"] = self.x_client.calls - calls_before
+        result["posts"] = len(
+            self.xapi.get_posts_from_trends_as_real_tweets(
+                geo="US", trends_count=self.args.topics, tweets_per_trend=self.args.tweets_per_topic
+            )["posts"]
+        )
+        return result
+
+    def stage_get_trends(self) -> Dict[str, Any]:
+        return self._cold_and_warm(lambda: self.trends.get_trends("US", limit=self.args.topics))
+
+    def _coords(self) -> List[tuple]:
+        rng = random.Random(self.args.seed)
+        return [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(self.args.geo_lookups)]
+
+    def stage_coords_to_geo(self) -> Dict[str, Any]:
+        coords = self._coords()
+
+        def lookup(c: tuple) -> None:
+            try:
+                self.googleapi.geocoder.lookup(*c)
+            except ValueError:
+                pass
+
+        self.reset()
+        self.googleapi.geocoder.lookup(0.0, 0.0)  # boundary file load is not part of the measurement
+        cold = _time_each(lookup, coords)
+        warm = _time_each(lookup, coords)
+        return {"cold": summarize(cold), "warm": summarize(warm)}
+
+    def stage_census_lookup(self) -> Dict[str, Any]:
+        coords = self._coords()[: max(1, self.args.repeat * 5)]
+        return {"cold": summarize(_time_each(lambda c: self.googleapi._coords_are_in_us(*c), coords))}
+
+    STAGES = (
+        "scan_post_caption",
+        "scan_post_captions_batch",
+        "get_ai_image_probability",
+        "generate_analyzed_feed",
+        "get_posts_from_trends_as_real_tweets",
+        "get_trends",
+        "coords_to_geo",
+        "census_lookup",
+    )
+
+    def run(self, stages: Sequence[str]) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        try:
+            # The pipelines log with print(); keep stdout for the JSON result
+            with contextlib.redirect_stdout(sys.stderr):
+                for name in stages:
+                    print(f"[bench] {name} ...", flush=True)
+                    results[name] = getattr(self, f"stage_{name}")()
+        finally:
+            self.server.stop()
+
+        import tokenizers
+        import torch
+        import transformers
+
+        return {
+            "version": RESULT_VERSION,
+            "meta": {
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "torch": torch.__version__,
+                "torch_threads": torch.get_num_threads(),
+                "transformers": transformers.__version__,
+                "tokenizers": tokenizers.__version__,
+                "args": vars(self.args),
+            },
+            "stages": results,
+        }
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """One line per stage/mode: p50 and p95 of `old` -> `new` with the relative change."""
+    lines = []
+    for stage, modes in sorted(new.get("stages", {}).items()):
+        for mode, summary in sorted(modes.items()):
+            before = (old.get("stages", {}).get(stage) or {}).get(mode)
+            if not isinstance(summary, dict) or not isinstance(before, dict) or not before.get("count"):
+                continue
+            parts = []
+            for key in ("p50_ms", "p95_ms"):
+                a, b = before[key], summary[key]
+                change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+                parts.append(f"{key[:3]} {a:.2f} -> {b:.2f} ms ({change})")
+            lines.append(f"{stage:<38} {mode:<5} " + "  ".join(parts))
+    return lines
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--models", choices=("stub", "real"), default="stub",
+                        help="tiny random stand-ins (offline) or the real HuggingFace models")
+    parser.add_argument("--stages", default=",".join(Bench.STAGES), help="comma-separated subset of stages")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--captions", type=int, default=64, help="caption corpus size")
+    parser.add_argument("--images", type=int, default=16, help="image corpus size")
+    parser.add_argument("--image-size", type=int, default=512, help="edge length of synthetic images in px")
+    parser.add_argument("--feed-posts", type=int, default=16, help="posts in the synthetic mock feed")
+    parser.add_argument("--topics", type=int, default=10, help="trend topics served by the fake RSS")
+    parser.add_argument("--tweets-per-topic", type=int, default=1)
+    parser.add_argument("--geo-lookups", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per cold/warm measurement")
+    parser.add_argument("--net-latency-ms", type=float, default=0.0, help="delay added by the fake HTTP server")
+    parser.add_argument("--x-latency-ms", type=float, default=0.0, help="delay added by the fake X client")
+    parser.add_argument("--output", "-o", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in Bench.STAGES]
+    if unknown:
+        parser.error(f"unknown stages {unknown}; choose from {list(Bench.STAGES)}")
+
+    result = Bench(args).run(stages)
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        print("\n".join(compare(old, result)), file=sys.stderr)
+    return 0
@@ -0,0 +1,99 @@
+"""
+Small randomly initialised stand-ins for the HuggingFace models.
+
+`install()` patches ai_engine's loaders so the caption ensemble gets tiny
+BERT classifiers with a character-level vocabulary and the image detector
+becomes a small conv net behind the same call signature as the transformers
+image-classification pipeline. Scores are meaningless, but tokenization,
+batching, padding and forward passes all run for real, so the rest of the
+pipeline can be benchmarked without network access or model downloads.
+Absolute model latencies are of course far below the real models'; use
+`--models real` when the HuggingFace cache is available.
+"""
+from __future__ import annotations
+
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+import numpy as np
+import torch
+from PIL import Image
+
+_SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+_IMAGE_PX = 224
+
+
+def _vocab_file() -> str:
+    words = _SPECIAL_TOKENS + [chr(c) for c in range(33, 127)]
+    path = Path(tempfile.mkdtemp(prefix="slopchop-bench-")) / "vocab.txt"
+    path.write_text("\n".join(words), encoding="utf-8")
+    return str(path)
+
+
+class StubImageDetector:
+    """Callable like `pipeline("image-classification")`: image(s) in, label/score dicts out."""
+
+    def __init__(self, seed: int = 0) -> None:
+        torch.manual_seed(seed)
+        self.model = torch.nn.Sequential(
+            torch.nn.Conv2d(3, 16, 5, stride=4),
+            torch.nn.ReLU(),
+            torch.nn.Conv2d(16, 32, 3, stride=2),
+            torch.nn.ReLU(),
+            torch.nn.AdaptiveAvgPool2d(1),
+            torch.nn.Flatten(),
+            torch.nn.Linear(32, 2),
+        ).eval()
+
+    @staticmethod
+    def _tensor(img: Image.Image) -> torch.Tensor:
+        arr = np.asarray(img.convert("RGB").resize((_IMAGE_PX, _IMAGE_PX)), dtype=np.float32) / 255.0
+        return torch.from_numpy(arr).permute(2, 0, 1)
+
+    def __call__(
+        self, images: Union[Image.Image, List[Image.Image]], batch_size: int = 1, **kwargs: Any
+    ) -> Union[List[Dict[str, Any]], List[List[Dict[str, Any]]]]:
+        single = not isinstance(images, list)
+        batch = [images] if single else images
+        results: List[List[Dict[str, Any]]] = []
+        for start in range(0, len(batch), max(1, batch_size)):
+            chunk = torch.stack([self._tensor(img) for img in batch[start:start + batch_size]])
+            with torch.no_grad():
+                probs = torch.softmax(self.model(chunk), dim=-1).tolist()
+            results.extend([{"label": "artificial", "score": p[1]}, {"label": "human", "score": p[0]}] for p in probs)
+        return results[0] if single else results
+
+
+def install() -> None:
+    """Point ai_engine's tokenizer, caption model and pipeline loaders at the stubs."""
+    import transformers
+
+    import ai_engine
+
+    vocab = _vocab_file()
+    vocab_size = len(_SPECIAL_TOKENS) + (127 - 33)
+
+    def tokenizer(name: str, *args: Any, **kwargs: Any) -> Any:
+        return transformers.BertTokenizerFast(vocab_file=vocab)
+
+    def caption_model(name: str, *args: Any, **kwargs: Any) -> Any:
+        torch.manual_seed(zlib.crc32(name.encode("utf-8")))
+        config = transformers.BertConfig(
+            vocab_size=vocab_size,
+            hidden_size=64,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            intermediate_size=128,
+            max_position_embeddings=512,
+            num_labels=2,
+        )
+        return transformers.BertForSequenceClassification(config).eval()
+
+    def image_pipeline(task: str, *args: Any, **kwargs: Any) -> StubImageDetector:
+        return StubImageDetector()
+
+    ai_engine.AutoTokenizer.from_pretrained = tokenizer
+    ai_engine.AutoModelForSequenceClassification.from_pretrained = caption_model
+    ai_engine.pipeline = image_pipeline
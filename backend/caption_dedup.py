@@ -0,0 +1,158 @@
+"""
+Near-duplicate caption index.
+
+Scam and spam captions are templated: they differ in t.co links, @mentions,
+emoji or amounts. Captions are normalized (those parts stripped or replaced by
+placeholders, whitespace collapsed) and fingerprinted with a MinHash signature
+over their word set. Signatures are split into LSH bands so only captions that
+share a band are compared, and a candidate is a hit when its exact Jaccard
+similarity reaches the threshold.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+NEAR_DUP_ENABLED = os.getenv("SLOPCHOP_NEAR_DUP", "1") != "0"
+NEAR_DUP_MIN_SIMILARITY = float(os.getenv("SLOPCHOP_NEAR_DUP_MIN_SIMILARITY", "0.75"))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("SLOPCHOP_NEAR_DUP_MAX_ENTRIES", "50000"))
+# Word sets of very short captions are too small for fuzzy matching;
+# those only reuse scores on an exact normalized match.
+NEAR_DUP_MIN_TOKENS = 5
+
+# 16 bands x 4 rows: pairs at Jaccard 0.75 share a band ~99% of the time,
+# pairs at 0.3 only ~12%, which keeps candidate lists short.
+_BANDS = 16
+_ROWS = 4
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20260214)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(_BANDS * _ROWS)]
+
+_URL_RE = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+_MENTION_RE = re.compile(r"@\w+")
+_AMOUNT_RE = re.compile(r"[$£€]?\d[\d,.]*(?:[kmb%]|\s?bhp)?", re.IGNORECASE)
+_NON_WORD_RE = re.compile(r"[^\w\s#<>]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_caption(text: str) -> str:
+    """Lowercase and strip urls, mentions, amounts, emoji and punctuation."""
+    t = (text or "").lower().replace("&amp;", "&")
+    t = _URL_RE.sub(" ", t)
+    t = _MENTION_RE.sub(" ", t)
+    t = _AMOUNT_RE.sub(" <num> ", t)
+    t = _NON_WORD_RE.sub(" ", t)
+    return _SPACE_RE.sub(" ", t).strip()
+
+
+def _hash61(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") % _PRIME
+
+
+def minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    """MinHash signature of a token set, one value per permutation."""
+    hashes = [_hash61(t) for t in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(b, signature[b * _ROWS:(b + 1) * _ROWS]) for b in range(_BANDS)]
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class NearDuplicateIndex:
+    """
+    Maps captions to previously computed scores by near-duplicate lookup.
+
+    Args:
+        min_similarity: Min Jaccard similarity of normalized word sets for a hit.
+        max_entries: Oldest entries are dropped beyond this many.
+    """
+
+    def __init__(self, min_similarity: float = NEAR_DUP_MIN_SIMILARITY, max_entries: int = NEAR_DUP_MAX_ENTRIES) -> None:
+        self.min_similarity = min_similarity
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # normalized caption -> (word set, signature or None, score)
+        self._entries: "OrderedDict[str, Tuple[FrozenSet[str], Optional[Tuple[int, ...]], float]]" = OrderedDict()
+        self._bands: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+
+    def lookup(self, caption: str) -> Optional[float]:
+        """Score of a stored caption that normalizes identically or nearly so, else None."""
+        norm = normalize_caption(caption)
+        tokens = frozenset(norm.split())
+        signature = minhash(tokens) if len(tokens) >= NEAR_DUP_MIN_TOKENS else None
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get(norm)
+            if entry is not None:
+                self.exact_hits += 1
+                return entry[2]
+            if signature is None:
+                return None
+
+            candidates: Set[str] = set()
+            for band in _bands(signature):
+                candidates |= self._bands.get(band, set())
+            best: Optional[Tuple[float, float]] = None
+            for candidate in candidates:
+                other_tokens, _, score = self._entries[candidate]
+                similarity = jaccard(tokens, other_tokens)
+                if similarity >= self.min_similarity and (best is None or similarity > best[0]):
+                    best = (similarity, score)
+            if best is None:
+                return None
+            self.near_hits += 1
+            return best[1]
+
+    def add(self, caption: str, score: float) -> None:
+        norm = normalize_caption(caption)
+        tokens = frozenset(norm.split())
+        signature = minhash(tokens) if len(tokens) >= NEAR_DUP_MIN_TOKENS else None
+        with self._lock:
+            if norm in self._entries:
+                self._entries[norm] = self._entries[norm][:2] + (score,)
+                return
+            self._entries[norm] = (tokens, signature, score)
+            if signature is not None:
+                for band in _bands(signature):
+                    self._bands.setdefault(band, set()).add(norm)
+            while len(self._entries) > self.max_entries:
+                self._drop(*self._entries.popitem(last=False))
+
+    def _drop(self, norm: str, entry: Tuple[FrozenSet[str], Optional[Tuple[int, ...]], float]) -> None:
+        if entry[1] is None:
+            return
+        for band in _bands(entry[1]):
+            members = self._bands.get(band)
+            if members is not None:
+                members.discard(norm)
+                if not members:
+                    del self._bands[band]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.near_hits
+            return {
+                "enabled": NEAR_DUP_ENABLED,
+                "entries": len(self._entries),
+                "min_similarity": self.min_similarity,
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            }
+
+
+index = NearDuplicateIndex()
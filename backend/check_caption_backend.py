@@ -0,0 +1,95 @@
+"""
+Accuracy-drift and speed check for the caption inference backends.
+
+Scores every caption of feed_service.get_mock_feed() with the FP32 reference
+and with the candidate backend, then reports score drift, flag changes,
+CPU time per caption and resident memory of each ensemble.
+
+Usage (from backend/):
+    python check_caption_backend.py --backend int8
+    python check_caption_backend.py --backend onnx --max-drift 3
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+
+import ai_engine
+from feed_service import get_mock_feed
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _flag(score: float) -> str:
+    # Same text-only thresholds as feed_service.generate_analyzed_feed
+    if score > 75:
+        return "Likely AI/Scam"
+    if score > 40:
+        return "Uncertain"
+    return "Likely Human"
+
+
+def _timed_scores(captions, backend, repeats):
+    ai_engine.get_loaded_models(backend)
+    ai_engine.scan_post_captions(captions[:1], backend=backend)
+    cpu = time.process_time()
+    for _ in range(repeats):
+        scores = ai_engine.scan_post_captions(captions, backend=backend)
+    cpu_ms = (time.process_time() - cpu) * 1000 / (repeats * len(captions))
+    return scores, cpu_ms
+
+
+def check_drift(backend: str, reference: str = "fp32", repeats: int = 3) -> dict:
+    captions = [post["caption"] for post in get_mock_feed()["posts"]]
+
+    rss_start = _rss_mb()
+    ref_scores, ref_cpu_ms = _timed_scores(captions, reference, repeats)
+    rss_ref = _rss_mb()
+    new_scores, new_cpu_ms = _timed_scores(captions, backend, repeats)
+    rss_new = _rss_mb()
+
+    diffs = [abs(a - b) for a, b in zip(ref_scores, new_scores)]
+    flag_changes = [
+        {"caption": c[:60], "reference": r, "candidate": n}
+        for c, r, n in zip(captions, ref_scores, new_scores)
+        if _flag(r) != _flag(n)
+    ]
+    return {
+        "reference": reference,
+        "backend": backend,
+        "captions": len(captions),
+        "max_abs_drift": round(max(diffs), 2),
+        "mean_abs_drift": round(sum(diffs) / len(diffs), 2),
+        "flag_changes": flag_changes,
+        "cpu_ms_per_caption": {reference: round(ref_cpu_ms, 2), backend: round(new_cpu_ms, 2)},
+        "speedup": round(ref_cpu_ms / new_cpu_ms, 2) if new_cpu_ms else None,
+        # Peak-RSS growth while loading each ensemble; a rough resident-memory proxy
+        "rss_growth_mb": {reference: round(rss_ref - rss_start, 1), backend: round(rss_new - rss_ref, 1)},
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=ai_engine.CAPTION_BACKENDS, default=ai_engine.CAPTION_BACKEND)
+    parser.add_argument("--reference", choices=ai_engine.CAPTION_BACKENDS, default="fp32")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-drift", type=float, default=5.0,
+                        help="Fail if any caption's score moves more than this many points.")
+    args = parser.parse_args()
+
+    report = check_drift(args.backend, args.reference, args.repeats)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if report["max_abs_drift"] > args.max_drift or report["flag_changes"]:
+        print(f"❌ {args.backend} drifts from {args.reference} beyond tolerance")
+        return 1
+    print(f"✅ {args.backend} matches {args.reference} within {args.max_drift} points")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
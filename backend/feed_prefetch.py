@@ -0,0 +1,178 @@
+"""
+Background prefetch of trend feeds for the most requested geos.
+
+Every location submission and news read records its geo in a popularity
+table with exponential decay. A daemon thread periodically takes the
+hottest geos and rebuilds their feeds in feed_store shortly before they
+expire, so the next visitor from a popular geo gets a warm, already-scored
+feed instead of paying for the Trends fetch, X searches and scoring.
+
+Prefetching spends X API calls nobody is waiting for, so it is capped by an
+hourly call budget and pauses while the X rate-limit window runs low. Each
+rebuild runs under a rate_limit.call_budget, so the governor refuses its X
+calls past `max_calls_per_build` and the hourly budget is never overrun.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from feed_store import FEED_TTL_S, Feed, store as feed_store
+from src.googleapi import CACHE_TTL_SECONDS
+from src.rate_limit import call_budget, governor
+from src.xapi import SEARCH_ROUTE, TWEET_CACHE_TTL_S
+
+PREFETCH_TOP_N = int(os.getenv("SLOPCHOP_PREFETCH_TOP_N", "5"))
+PREFETCH_CHECK_S = float(os.getenv("SLOPCHOP_PREFETCH_CHECK_S", "30"))
+# Popularity halves every this many seconds without requests
+PREFETCH_HALF_LIFE_S = float(os.getenv("SLOPCHOP_PREFETCH_HALF_LIFE_S", str(60 * 60)))
+# Geos tracked at most; a new geo evicts the least popular one
+PREFETCH_MAX_TRACKED = int(os.getenv("SLOPCHOP_PREFETCH_MAX_TRACKED", "256"))
+# Rebuild this long before the earliest of the feed / Trends / tweet cache expiries
+PREFETCH_LEAD_S = float(os.getenv("SLOPCHOP_PREFETCH_LEAD_S", "90"))
+# X search calls prefetching may spend per rolling hour
+PREFETCH_X_BUDGET_PER_HOUR = int(os.getenv("SLOPCHOP_PREFETCH_X_BUDGET_PER_HOUR", "150"))
+# Leave at least this many calls of the current X rate-limit window to live traffic
+PREFETCH_MIN_X_REMAINING = int(os.getenv("SLOPCHOP_PREFETCH_MIN_X_REMAINING", "60"))
+
+REFRESH_AFTER_S = max(0.0, min(FEED_TTL_S, CACHE_TTL_SECONDS, TWEET_CACHE_TTL_S) - PREFETCH_LEAD_S)
+
+
+class Popularity:
+    """Exponentially decayed request counts per geo, for at most `max_geos` geos."""
+
+    def __init__(self, half_life_s: float = PREFETCH_HALF_LIFE_S, max_geos: int = PREFETCH_MAX_TRACKED) -> None:
+        self._decay = math.log(2) / half_life_s
+        self.max_geos = max_geos
+        self._scores: Dict[str, Tuple[float, float]] = {}  # geo -> (score, at)
+        self._lock = threading.Lock()
+
+    def _current(self, geo: str, now: float) -> float:
+        score, at = self._scores.get(geo, (0.0, now))
+        return score * math.exp(-self._decay * (now - at))
+
+    def record(self, geo: str) -> None:
+        geo = geo.upper().strip()
+        now = time.time()
+        with self._lock:
+            if geo not in self._scores and len(self._scores) >= self.max_geos:
+                coldest = min(self._scores, key=lambda g: self._current(g, now))
+                del self._scores[coldest]
+            self._scores[geo] = (self._current(geo, now) + 1.0, now)
+
+    def top(self, n: int, min_score: float = 0.05) -> List[Tuple[str, float]]:
+        now = time.time()
+        with self._lock:
+            scored = [(geo, self._current(geo, now)) for geo in self._scores]
+            # Forget geos nobody has asked for in a long time
+            for geo, score in scored:
+                if score < min_score:
+                    del self._scores[geo]
+        scored = [(geo, score) for geo, score in scored if score >= min_score]
+        scored.sort(key=lambda gs: gs[1], reverse=True)
+        return scored[:n]
+
+
+class Prefetcher:
+    """
+    Keeps the feeds of the top geos warm within an X API budget.
+
+    Args:
+        build: Builds the feed for a geo (same pipeline as a location submission).
+        max_calls_per_build: X searches one build may make; reserved from the hourly
+            budget before starting a rebuild and enforced by the rate-limit governor
+            (topics past it are served from stale tweets).
+    """
+
+    def __init__(self, build: Callable[[str], Optional[Feed]], max_calls_per_build: int = 15) -> None:
+        self.build = build
+        self.max_calls_per_build = max_calls_per_build
+        self.popularity = Popularity()
+        self._spent: Deque[Tuple[float, int]] = deque()  # (at, x_calls) per rebuild
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshed = 0
+        self.failed = 0
+        self.skipped_budget = 0
+        self.skipped_rate_limit = 0
+        self.last_run: Optional[float] = None
+
+    def record_request(self, geo: Optional[str]) -> None:
+        if geo:
+            self.popularity.record(geo)
+
+    def _spent_last_hour(self) -> int:
+        cutoff = time.time() - 3600
+        with self._lock:
+            while self._spent and self._spent[0][0] < cutoff:
+                self._spent.popleft()
+            return sum(calls for _, calls in self._spent)
+
+    def _x_remaining(self) -> Optional[int]:
+        window = governor.snapshot()["windows"].get(SEARCH_ROUTE)
+        if not window or window["reset_in_s"] <= 0:
+            return None
+        return window["remaining"]
+
+    def _is_due(self, geo: str) -> bool:
+        age = feed_store.age(geo)
+        return age is None or age >= REFRESH_AFTER_S
+
+    def run_once(self) -> List[str]:
+        """Rebuild the due feeds of the top geos, hottest first; returns the geos rebuilt."""
+        self.last_run = time.time()
+        refreshed: List[str] = []
+        for geo, _ in self.popularity.top(PREFETCH_TOP_N):
+            if not self._is_due(geo):
+                continue
+            remaining = self._x_remaining()
+            if remaining is not None and remaining < PREFETCH_MIN_X_REMAINING:
+                self.skipped_rate_limit += 1
+                break
+            if self._spent_last_hour() + self.max_calls_per_build > PREFETCH_X_BUDGET_PER_HOUR:
+                self.skipped_budget += 1
+                break
+
+            with call_budget(self.max_calls_per_build) as budget:
+                try:
+                    feed_store.refresh(geo, lambda: self.build(geo))
+                    refreshed.append(geo)
+                    self.refreshed += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Feed prefetch failed for {geo}: {e}")
+            with self._lock:
+                self._spent.append((time.time(), budget.used))
+        return refreshed
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Feed prefetch loop error: {e}")
+            time.sleep(PREFETCH_CHECK_S)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="feed-prefetch", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None,
+            "refresh_after_s": REFRESH_AFTER_S,
+            "top": [{"geo": geo, "score": round(score, 3), "age_s": feed_store.age(geo)}
+                    for geo, score in self.popularity.top(PREFETCH_TOP_N)],
+            "x_calls_last_hour": self._spent_last_hour(),
+            "x_budget_per_hour": PREFETCH_X_BUDGET_PER_HOUR,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "skipped_budget": self.skipped_budget,
+            "skipped_rate_limit": self.skipped_rate_limit,
+            "last_run": self.last_run,
+        }
@@ -1,5 +1,33 @@
-import ai_engine
+import inference_scheduler
+import profiling
+import hashlib
+import json
+import os
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+from src.metrics import STAGE_SECONDS
+
+# Scores the next batch of a streamed feed while the current one is being sent
+_stream_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="feed-stream")
+
+# Scored snapshot of the mock feed, rebuilt in the background on a schedule or
+# when the feed content changes. Requests only shuffle copies of it.
+SNAPSHOT_REFRESH_S = float(os.getenv("SLOPCHOP_FEED_SNAPSHOT_REFRESH_S", "600"))
+SNAPSHOT_CHECK_S = float(os.getenv("SLOPCHOP_FEED_SNAPSHOT_CHECK_S", "30"))
+# First retry after a build with failed posts; doubles per failed build, up to SNAPSHOT_REFRESH_S
+SNAPSHOT_RETRY_S = float(os.getenv("SLOPCHOP_FEED_SNAPSHOT_RETRY_S", "30"))
+_snapshot = None  # (content_hash, built_at, tuple of read-only posts, failed post count)
+_snapshot_lock = threading.RLock()
+_failed_builds = 0  # consecutive builds with failed posts
+_retry_at = 0.0
+_refresher = None
+
+_CAPTION_STAGE = STAGE_SECONDS.labels("caption_scoring")
+_IMAGE_STAGE = STAGE_SECONDS.labels("image_scoring")
 
 def get_mock_feed():
     """Hard-coded combined feed (Instagram-style + Twitter-style) for frontend testing."""
@@ -229,25 +257,148 @@ def get_mock_feed():
 # --- THE LOGIC ---
 def generate_analyzed_feed():
     """
-    Fetches the mock feed and runs the AI engine on each post.
+    Serves the scored mock feed snapshot (scoring it on first use) with a
+    fresh shuffle and hero placement.
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            snapshot = _snapshot or build_feed_snapshot()
+    posts = [dict(post) for post in snapshot[2]]
+
+    return _inject_hero_post(posts, "microsoft_support_team")
+
+def iter_analyzed_feed(first_batch=1, max_batch=8):
+    """
+    Same feed as generate_analyzed_feed, but yields each post as soon as its
+    batch is scored, in final feed order. Batches grow geometrically from
+    `first_batch` to `max_batch`, so the first post only waits for its own
+    scores, and the next batch is scored while the current one is sent.
+    Once the snapshot exists the whole feed is available immediately.
     """
+    if _snapshot is not None:
+        yield from generate_analyzed_feed()
+        return
+
     feed_data = get_mock_feed()
-    posts = feed_data["posts"]
-    
-    posts = _inject_hero_post(posts, "microsoft_support_team")
+    posts = _inject_hero_post(feed_data["posts"], "microsoft_support_team")
+
+    batches = []
+    start, size = 0, max(1, first_batch)
+    while start < len(posts):
+        batches.append(posts[start:start + size])
+        start += size
+        size = min(size * 2, max_batch)
+
+    pending = None
+    for i in range(len(batches)):
+        current = pending if pending is not None else _stream_executor.submit(_analyze_posts, batches[i])
+        pending = _stream_executor.submit(_analyze_posts, batches[i + 1]) if i + 1 < len(batches) else None
+        yield from current.result()
+
+def _feed_content_hash(posts):
+    content = [(p["id"], p["caption"], p["image_url"]) for p in posts]
+    return hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+
+def build_feed_snapshot():
+    """
+    Scores the mock feed in its original order and swaps in a new read-only
+    snapshot. A build with failed posts (AI errors, images that did not
+    download) never replaces a snapshot of the same feed with fewer failures,
+    and is retried after SNAPSHOT_RETRY_S (doubling) instead of waiting for
+    the next full refresh.
+    """
+    return profiling.run("feed_snapshot", _build_feed_snapshot)
 
+def _build_feed_snapshot():
+    global _snapshot, _failed_builds, _retry_at
+    with _snapshot_lock, STAGE_SECONDS.labels("feed_snapshot_build").time():
+        posts = get_mock_feed()["posts"]
+        content_hash = _feed_content_hash(posts)
+        failed = []
+        analyzed = _analyze_posts(posts, failed)
+        built = (content_hash, time.time(), tuple(MappingProxyType(p) for p in analyzed), len(failed))
+        if failed:
+            _failed_builds += 1
+            delay = min(SNAPSHOT_RETRY_S * 2 ** (_failed_builds - 1), SNAPSHOT_REFRESH_S)
+            _retry_at = built[1] + delay
+            print(f"Feed snapshot build had {len(failed)} failed posts; retrying in {delay:.0f}s")
+        else:
+            _failed_builds = 0
+        # Keep the previous scores of the same feed content over a worse build
+        if _snapshot is None or content_hash != _snapshot[0] or len(failed) <= _snapshot[3]:
+            _snapshot = built
+        return _snapshot
+
+def _snapshot_is_current():
+    if _snapshot is None:
+        return False
+    if _failed_builds:
+        return time.time() < _retry_at
+    content_hash, built_at, _, _ = _snapshot
+    if time.time() - built_at >= SNAPSHOT_REFRESH_S:
+        return False
+    return content_hash == _feed_content_hash(get_mock_feed()["posts"])
+
+def _refresh_loop():
+    while True:
+        try:
+            if not _snapshot_is_current():
+                build_feed_snapshot()
+        except Exception as e:
+            print(f"Feed snapshot refresh failed: {e}")
+        time.sleep(SNAPSHOT_CHECK_S)
+
+def start_snapshot_refresher():
+    """Builds the first snapshot and keeps it current from a daemon thread."""
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name="feed-snapshot", daemon=True)
+        _refresher.start()
+
+def snapshot_info():
+    if _snapshot is None:
+        return {"ready": False}
+    content_hash, built_at, posts, failed = _snapshot
+    return {"ready": True, "content_hash": content_hash, "built_at": built_at,
+            "age_seconds": round(time.time() - built_at, 1), "count": len(posts),
+            "failed_posts": failed, "retry_at": _retry_at if _failed_builds else None}
+
+def _analyze_posts(posts, failed=None):
+    """
+    Scores a list of posts in batches and sets risk_score, ai_image_probability and flag.
+    Ids of posts whose caption or image could not be scored are appended to `failed`.
+    """
     analyzed_feed = []
+
+    # 1. Run Text Analysis for the whole feed in batches
+    try:
+        with _CAPTION_STAGE.time():
+            risk_scores = inference_scheduler.scan_captions([post["caption"] for post in posts])
+    except Exception as e:
+        print(f"AI Error on caption batch: {e}")
+        risk_scores = [None] * len(posts)
+
+    # 2. Run Image Analysis for the whole feed in batches
+    try:
+        with _IMAGE_STAGE.time():
+            ai_probs = inference_scheduler.image_probabilities([post["image_url"] for post in posts], default=None)
+    except Exception as e:
+        print(f"AI Error on image batch: {e}")
+        ai_probs = [None] * len(posts)
     
-    for post in posts:
+    for post, risk_score, ai_prob in zip(posts, risk_scores, ai_probs):
         try:
             print(f"Processing post: {post['id']}...")
-            
-            # 1. Run Text Analysis
-            risk_score = ai_engine.scan_post_caption(post["caption"])
-            
-            # 2. Run Image Analysis
-            ai_prob = ai_engine.get_ai_image_probability(post["image_url"])
-            
+
+            if risk_score is None:
+                raise RuntimeError("batch scan failed")
+            if ai_prob is None:
+                # Image did not download or classify: caption-only score for this build
+                ai_prob = 0.0
+                if failed is not None:
+                    failed.append(post['id'])
+
             # 3. Update Post Data
             post['risk_score'] = risk_score
             post['ai_image_probability'] = ai_prob
@@ -265,6 +416,8 @@ def generate_analyzed_feed():
             print(f"AI Error on {post['id']}: {e}")
             post['risk_score'] = -1
             post['flag'] = "AI Error"
+            if failed is not None:
+                failed.append(post['id'])
             
         analyzed_feed.append(post)
 
@@ -0,0 +1,112 @@
+"""
+Keyed store of computed trend feeds.
+
+Feeds are stored per geo, so every user in the same geo shares one computed
+feed, with a TTL and entry/byte caps from src.cache.TTLCache. Session tokens
+map to the geo their owner last submitted. Swaps are atomic: readers see
+either the old feed or the new one, never a partial list. Concurrent builds
+of the same geo are collapsed into one (single flight).
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from src.cache import TTLCache
+
+FEED_TTL_S = 10 * 60
+
+Feed = Dict[str, Any]
+
+
+def _has_posts(feed: Optional[Feed]) -> bool:
+    # xapi returns {"posts": []} when every search was refused or failed; that is not a feed
+    return bool(feed and feed.get("posts"))
+
+
+class FeedStore:
+    def __init__(self) -> None:
+        self._feeds: TTLCache[Feed] = TTLCache.from_env(
+            "feeds", ttl_s=FEED_TTL_S, stale_ttl_s=FEED_TTL_S, max_entries=200, max_bytes=64 * 1024 * 1024
+        )
+        self._sessions: TTLCache[str] = TTLCache.from_env(
+            "feed_sessions", ttl_s=24 * 60 * 60, max_entries=50000, max_bytes=16 * 1024 * 1024
+        )
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    @staticmethod
+    def _key(geo: str) -> str:
+        return geo.upper().strip()
+
+    def get(self, geo: str, allow_stale: bool = False) -> Optional[Feed]:
+        key = self._key(geo)
+        return self._feeds.get_stale(key) if allow_stale else self._feeds.get(key)
+
+    def put(self, geo: str, feed: Feed) -> None:
+        if not _has_posts(feed):
+            return
+        self._feeds.set(self._key(geo), feed)
+
+    def age(self, geo: str) -> Optional[float]:
+        return self._feeds.age(self._key(geo))
+
+    def get_or_build(self, geo: str, build: Callable[[], Optional[Feed]]) -> Optional[Feed]:
+        """
+        Return the fresh feed for `geo`, building it at most once at a time.
+
+        Callers arriving while a build for the same geo is running wait for
+        that build instead of starting their own. Failed builds and builds
+        without posts are not stored (readers keep the previous feed); a
+        failed build's exception is raised to every waiter.
+        """
+        key = self._key(geo)
+        cached = self._feeds.get(key)
+        if cached is not None:
+            return cached
+        return self._build_once(key, build)
+
+    def refresh(self, geo: str, build: Callable[[], Optional[Feed]]) -> Optional[Feed]:
+        """
+        Rebuild the feed for `geo` even if the stored one is still fresh.
+
+        Readers keep getting the old feed until the new one is swapped in.
+        Shares the single flight with `get_or_build`.
+        """
+        return self._build_once(self._key(geo), build)
+
+    def _build_once(self, key: str, build: Callable[[], Optional[Feed]]) -> Optional[Feed]:
+        with self._inflight_lock:
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[key] = Future()
+
+        if not owner:
+            return fut.result()
+
+        try:
+            feed = build()
+            if _has_posts(feed):
+                self._feeds.set(key, feed)
+            fut.set_result(feed)
+            return feed
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def bind_session(self, session: str, geo: str) -> None:
+        self._sessions.set(session, self._key(geo))
+
+    def geo_for_session(self, session: str) -> Optional[str]:
+        return self._sessions.get(session)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"feeds": self._feeds.stats(), "sessions": self._sessions.stats()}
+
+
+store = FeedStore()
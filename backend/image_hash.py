@@ -0,0 +1,124 @@
+"""
+Perceptual-hash index of AI-image probabilities.
+
+The same picture is reposted under different media keys and query strings,
+so URL-keyed caches miss it. Every decoded image gets a 64-bit dHash
+(gradient signs of a 9x8 grayscale thumbnail), which survives re-encoding and
+resizing. The index splits hashes into eight 8-bit bands: by pigeonhole any
+hash within 7 bits of a stored one shares at least one band with it, so only
+those candidates are compared by Hamming distance.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from PIL import Image
+
+PHASH_ENABLED = os.getenv("SLOPCHOP_PHASH", "1") != "0"
+PHASH_MAX_HAMMING = int(os.getenv("SLOPCHOP_PHASH_MAX_HAMMING", "4"))
+PHASH_MAX_ENTRIES = int(os.getenv("SLOPCHOP_PHASH_MAX_ENTRIES", "100000"))
+
+_BANDS = 8
+_BAND_BITS = 64 // _BANDS
+# Flat or smooth-gradient images hash to (nearly) all zeros or ones regardless
+# of content, so they are neither looked up nor stored.
+_MIN_SET_BITS = 4
+
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash: one bit per horizontally adjacent pixel pair."""
+    thumb = img.convert("L").resize((9, 8), Image.Resampling.BOX)
+    px = list(thumb.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = px[row * 9 + col], px[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def is_informative(h: int) -> bool:
+    return _MIN_SET_BITS <= bin(h).count("1") <= 64 - _MIN_SET_BITS
+
+
+def _bands(h: int) -> List[Tuple[int, int]]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(b, (h >> (b * _BAND_BITS)) & mask) for b in range(_BANDS)]
+
+
+class PerceptualHashIndex:
+    """
+    Hamming-distance lookup from image hash to AI-image probability.
+
+    Args:
+        max_hamming: Max differing bits for a hit; must stay below the band count.
+        max_entries: Oldest entries are dropped beyond this many.
+    """
+
+    def __init__(self, max_hamming: int = PHASH_MAX_HAMMING, max_entries: int = PHASH_MAX_ENTRIES) -> None:
+        if max_hamming >= _BANDS:
+            raise ValueError(f"max_hamming must be < {_BANDS} for band lookups to be exact")
+        self.max_hamming = max_hamming
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, float]" = OrderedDict()
+        self._bands: Dict[Tuple[int, int], Set[int]] = {}
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+
+    def lookup(self, h: int) -> Optional[float]:
+        """Probability stored for the closest hash within `max_hamming` bits, else None."""
+        with self._lock:
+            self.lookups += 1
+            if h in self._entries:
+                self.exact_hits += 1
+                self._entries.move_to_end(h)
+                return self._entries[h]
+
+            best: Optional[Tuple[int, int]] = None
+            for band in _bands(h):
+                for candidate in self._bands.get(band, ()):
+                    distance = bin(h ^ candidate).count("1")
+                    if distance <= self.max_hamming and (best is None or distance < best[0]):
+                        best = (distance, candidate)
+            if best is None:
+                return None
+            self.near_hits += 1
+            self._entries.move_to_end(best[1])
+            return self._entries[best[1]]
+
+    def add(self, h: int, prob: float) -> None:
+        with self._lock:
+            if h not in self._entries:
+                for band in _bands(h):
+                    self._bands.setdefault(band, set()).add(h)
+            self._entries[h] = prob
+            self._entries.move_to_end(h)
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                for band in _bands(old):
+                    members = self._bands.get(band)
+                    if members is not None:
+                        members.discard(old)
+                        if not members:
+                            del self._bands[band]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.near_hits
+            return {
+                "enabled": PHASH_ENABLED,
+                "entries": len(self._entries),
+                "max_hamming": self.max_hamming,
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            }
+
+
+index = PerceptualHashIndex()
@@ -0,0 +1,222 @@
+"""
+Micro-batching scheduler in front of ai_engine.
+
+Every in-flight request (feed, location submission, ...) enqueues its caption
+and image scoring jobs here instead of driving the models directly. One worker
+thread per job kind drains its queue into batches, flushing when the batch is
+full or when the oldest job has waited `max_wait_s`, and resolves a future per
+job. Requests therefore share forward passes instead of fighting over cores.
+
+Scores already in the persistent score_store are answered without queueing,
+and every freshly computed score is written back to it by the worker. Captions
+that are near-duplicates of an already scored caption (see caption_dedup)
+reuse that score instead of running the transformers.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import ai_engine
+import caption_dedup
+import image_hash
+from score_store import store
+
+BATCH_MAX_SIZE = int(os.getenv("SLOPCHOP_BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("SLOPCHOP_BATCH_MAX_WAIT_MS", "10"))
+
+
+class BatchQueue:
+    """
+    Queue of single-item jobs that are executed in batches by a worker thread.
+
+    Args:
+        name: Label used in stats.
+        run_batch: Callable mapping a list of unique items to a list of results.
+        max_batch_size: Flush as soon as this many jobs are queued.
+        max_wait_s: Flush at the latest this long after the first job arrived.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_s: float = BATCH_MAX_WAIT_MS / 1000,
+    ) -> None:
+        self.name = name
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_s)
+        self._queue: "queue.Queue[Tuple[Any, Future, float]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._last_batch_size = 0
+        self._wait_s_total = 0.0
+        self._run_s_total = 0.0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._loop, name=f"batch-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Enqueue one job and return a future for its result."""
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((item, fut, time.monotonic()))
+        return fut
+
+    def submit_many(self, items: List[Any]) -> List[Future]:
+        return [self.submit(item) for item in items]
+
+    def _collect(self) -> List[Tuple[Any, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+
+            # Identical jobs from different requests share one slot in the batch.
+            unique = list(dict.fromkeys(item for item, _, _ in batch))
+            try:
+                results = dict(zip(unique, self._run_batch(unique)))
+                for item, fut, _ in batch:
+                    fut.set_result(results[item])
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+            finished = time.monotonic()
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._last_batch_size = len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._wait_s_total += sum(started - queued_at for _, _, queued_at in batch)
+                self._run_s_total += finished - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            batches, items = self._batches, self._items
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait_s * 1000, 3),
+                "batches": batches,
+                "items": items,
+                "last_batch_size": self._last_batch_size,
+                "largest_batch": self._largest_batch,
+                "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+                "avg_wait_ms": round(self._wait_s_total / items * 1000, 3) if items else 0.0,
+                "avg_batch_run_ms": round(self._run_s_total / batches * 1000, 3) if batches else 0.0,
+            }
+
+
+def _run_caption_batch(captions: List[str]) -> List[float]:
+    scores = ai_engine.scan_post_captions(captions)
+    store.put_many("caption", ai_engine.CAPTION_MODEL_VERSION, dict(zip(captions, scores)))
+    if caption_dedup.NEAR_DUP_ENABLED:
+        for caption, score in zip(captions, scores):
+            caption_dedup.index.add(caption, score)
+    return scores
+
+
+def _run_image_batch(urls: List[str]) -> List[Optional[float]]:
+    probs = ai_engine.get_ai_image_probabilities(urls, default=None)
+    # Failed downloads are not persisted so they get retried next time.
+    store.put_many(
+        "image", ai_engine.IMAGE_MODEL_VERSION,
+        {url: p for url, p in zip(urls, probs) if p is not None},
+    )
+    return probs
+
+
+caption_queue = BatchQueue("captions", _run_caption_batch)
+image_queue = BatchQueue("images", _run_image_batch)
+
+
+def _stored_and_missing(kind: str, model: str, items: List[str]) -> Tuple[Dict[str, float], List[str]]:
+    known = store.get_many(kind, model, items)
+    return known, [item for item in dict.fromkeys(items) if item not in known]
+
+
+def _known_captions_and_missing(captions: List[str]) -> Tuple[Dict[str, float], List[str]]:
+    known, missing = _stored_and_missing("caption", ai_engine.CAPTION_MODEL_VERSION, captions)
+    if not caption_dedup.NEAR_DUP_ENABLED:
+        return known, missing
+    still_missing = []
+    for caption in missing:
+        score = caption_dedup.index.lookup(caption)
+        if score is None:
+            still_missing.append(caption)
+        else:
+            known[caption] = score
+    return known, still_missing
+
+
+def scan_captions(captions: List[str]) -> List[float]:
+    """Blocking: weighted ensemble caption scores, batched with other requests."""
+    known, missing = _known_captions_and_missing(captions)
+    known.update(zip(missing, [f.result() for f in caption_queue.submit_many(missing)]))
+    return [known[c] for c in captions]
+
+
+def image_probabilities(urls: List[str], default: Optional[float] = 0.0) -> List[Optional[float]]:
+    """
+    Blocking: AI-image probabilities, batched with other requests. Images that
+    fail to download or classify get `default` (pass None to tell them apart).
+    """
+    known, missing = _stored_and_missing("image", ai_engine.IMAGE_MODEL_VERSION, urls)
+    known.update(zip(missing, [f.result() for f in image_queue.submit_many(missing)]))
+    return [default if known[u] is None else known[u] for u in urls]
+
+
+async def scan_captions_async(captions: List[str]) -> List[float]:
+    known, missing = _known_captions_and_missing(captions)
+    scores = await asyncio.gather(*(asyncio.wrap_future(f) for f in caption_queue.submit_many(missing)))
+    known.update(zip(missing, scores))
+    return [known[c] for c in captions]
+
+
+async def image_probabilities_async(urls: List[str], default: Optional[float] = 0.0) -> List[Optional[float]]:
+    known, missing = _stored_and_missing("image", ai_engine.IMAGE_MODEL_VERSION, urls)
+    probs = await asyncio.gather(*(asyncio.wrap_future(f) for f in image_queue.submit_many(missing)))
+    known.update(zip(missing, probs))
+    return [default if known[u] is None else known[u] for u in urls]
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Queue depth and batch-size stats per job kind, plus score store, cascade and dedup counters."""
+    return {
+        "captions": caption_queue.stats(),
+        "images": image_queue.stats(),
+        "score_store": store.stats(),
+        "cascade": ai_engine.cascade_stats(),
+        "near_duplicates": caption_dedup.index.stats(),
+        "image_hashes": image_hash.index.stats(),
+    }
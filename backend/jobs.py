@@ -0,0 +1,96 @@
+"""
+Background jobs with status polling.
+
+Slow pipelines (Census lookup, Trends RSS, X searches, model inference) run on
+a bounded thread pool instead of the event loop. Submitting returns a job id
+right away; clients poll the job's status and fetch its result when done.
+Queued and running jobs are held until they finish; only finished jobs go
+into a bounded src.cache.TTLCache, so load can never evict a live job.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.cache import TTLCache
+
+JOB_WORKERS = int(os.getenv("SLOPCHOP_JOB_WORKERS", "4"))
+
+# Params that are credentials; never echoed back by the job status endpoint
+PRIVATE_PARAMS = frozenset({"session", "token", "password", "api_key"})
+
+
+class Job:
+    def __init__(self, kind: str, params: Dict[str, Any]) -> None:
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": {k: v for k, v in self.params.items() if k not in PRIVATE_PARAMS},
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    def __init__(self, max_workers: int = JOB_WORKERS) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: TTLCache[Job] = TTLCache.from_env("jobs", ttl_s=60 * 60, max_entries=10000)
+        self._active: Dict[str, Job] = {}
+        self._active_lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], **params: Any) -> Job:
+        """Queue `fn(**params)` and return its job immediately."""
+        job = Job(kind, params)
+        with self._active_lock:
+            self._active[job.id] = job
+        job.future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any]) -> Any:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(**job.params)
+            job.status = "done"
+            return job.result
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            raise
+        finally:
+            job.finished_at = time.time()
+            self._jobs.set(job.id, job)
+            with self._active_lock:
+                self._active.pop(job.id, None)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._active_lock:
+            job = self._active.get(job_id)
+        return job if job is not None else self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._active_lock:
+            active = len(self._active)
+        return {**self._jobs.stats(), "active": active}
+
+
+registry = JobRegistry()
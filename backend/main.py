@@ -1,24 +1,44 @@
 from pathlib import Path
+from typing import Optional
+import asyncio
+import hmac
+import json
+import os
 import sys
+import threading
+import time
 
 # --- PATH SETUP ---
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import ai_engine
 import feed_service
+import inference_scheduler
+import profiling
+import query_variants
+from src import metrics
+from src.cache import all_cache_stats
 from src.googleapi import coords_to_geo
+from src.rate_limit import governor as x_rate_limit
+from src import trends
+from src.geocoder import geocoder
+from src.metrics import HTTP_REQUEST_SECONDS, STAGE_SECONDS
 from src.xapi import get_posts_from_trends_as_real_tweets as get_trending_posts
+from feed_store import store as feed_store
+from feed_prefetch import Prefetcher
+from jobs import registry as job_registry
 from models import LocationData, PostData
 
 app = FastAPI()
 
-# --- 1. GLOBAL STATE ---
-# We use this to store data between the POST and GET requests
-newsData = []
+# --- 1. SHARED STATE ---
+# Trend feeds computed by /api/submit-location live in feed_store, keyed by
+# geo and shared between every client in that geo; /api/news reads from it
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,44 +48,238 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Labelled by route template (not raw path) to keep label cardinality bounded.
+    # Streaming responses are timed up to their headers, not the last chunk.
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(getattr(route, "path", "unmatched"), request.method, status).observe(
+            time.perf_counter() - started)
+
+@app.on_event("startup")
+def start_model_warm_up():
+    # Load and warm the models off the request path; /api/ready flips once done
+    if os.getenv("SLOPCHOP_WARMUP", "1") != "0":
+        threading.Thread(target=ai_engine.warm_up, name="model-warm-up", daemon=True).start()
+
+@app.on_event("startup")
+def start_feed_snapshot():
+    # Score the demo feed once in the background; /api/feed then only shuffles it
+    if os.getenv("SLOPCHOP_FEED_SNAPSHOT", "1") != "0":
+        feed_service.start_snapshot_refresher()
+
+# Keeps the feeds of the most requested geos warm (same pipeline as /api/submit-location)
+# 10 topics: one search each plus room for a variant fallback or retry on half of them
+feed_prefetcher = Prefetcher(lambda geo: get_trending_posts(geo, 10, 1), max_calls_per_build=15)
+
+@app.on_event("startup")
+def start_feed_prefetch():
+    if os.getenv("SLOPCHOP_PREFETCH", "1") != "0":
+        feed_prefetcher.start()
+
 @app.get("/api")
 async def root():
     return {"message": "Server is running"}
 
+# --- HEALTH / READINESS ---
+@app.get("/api/health")
+async def health():
+    # Liveness: the process is up and serving, models may still be loading
+    return {"status": "ok"}
+
+@app.get("/api/ready")
+async def ready():
+    # Readiness: models are loaded and warmed up
+    state = ai_engine.readiness()
+    return JSONResponse(state, status_code=200 if ai_engine.is_ready() else 503)
+
 # --- FEED ENDPOINT ---
 @app.get("/api/feed")
 def get_feed():
     # This serves the Instagram-style feed (Mock + AI)
     return feed_service.generate_analyzed_feed()
+
+# --- STREAMING FEED ENDPOINT ---
+@app.get("/api/feed/stream")
+def stream_feed(format: str = "ndjson"):
+    # Same posts as /api/feed, sent one by one as soon as each is scored.
+    # format=ndjson: one JSON post per line; format=sse: Server-Sent Events
+    posts = feed_service.iter_analyzed_feed()
+    if format == "sse":
+        lines = (f"data: {json.dumps(post)}\n\n" for post in posts)
+        return StreamingResponse(lines, media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"})
+    lines = (json.dumps(post) + "\n" for post in posts)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
     
+# --- INFERENCE SCHEDULER STATS ---
+@app.get("/api/stats/inference")
+def get_inference_stats():
+    return {**inference_scheduler.stats(), "feed_snapshot": feed_service.snapshot_info()}
+
+# --- CACHE STATS ---
+@app.get("/api/stats/caches")
+def get_cache_stats():
+    return all_cache_stats()
+
+# --- X API RATE-LIMIT BUDGET AND QUERY VARIANT STATS ---
+@app.get("/api/stats/x-rate-limit")
+def get_x_rate_limit_stats():
+    return {**x_rate_limit.snapshot(), "query_variants": query_variants.stats.stats()}
+
+# --- PROMETHEUS METRICS ---
+@app.get("/metrics")
+def get_metrics():
+    return Response(metrics.generate_latest(), media_type=metrics.CONTENT_TYPE)
+
+# --- ADMIN: ON-DEMAND PROFILING ---
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Without SLOPCHOP_ADMIN_TOKEN the admin endpoints don't exist
+    if not profiling.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, profiling.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+def start_profile(mode: str = "sample", requests: Optional[int] = Query(None, ge=1),
+                  duration_s: Optional[float] = Query(None, gt=0), interval_ms: float = Query(5, ge=1),
+                  torch: bool = False, rebuild_feed: bool = False):
+    # Profiles the next `requests` feed builds (demo feed snapshot builds,
+    # /api/submit-location) and/or everything within `duration_s`; defaults
+    # to the next 5. /api/feed only shuffles the snapshot, so rebuild_feed=true
+    # starts a snapshot build right away instead of waiting for the refresher.
+    if requests is None and duration_s is None:
+        requests = 5
+    try:
+        session = profiling.start(mode, requests, duration_s, interval_ms / 1000, torch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not rebuild_feed:
+        return session.status()
+    job = job_registry.submit("feed-snapshot", rebuild_feed_snapshot)
+    return {**session.status(), "rebuild_job_id": job.id}
+
+def rebuild_feed_snapshot() -> dict:
+    """Rebuild the scored demo feed now (admin job, e.g. to profile it)."""
+    feed_service.build_feed_snapshot()
+    return feed_service.snapshot_info()
+
+@app.get("/api/admin/profile", dependencies=[Depends(require_admin)])
+def get_profile_status():
+    session = profiling.current()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile has been started")
+    return session.status()
+
+@app.post("/api/admin/profile/stop", dependencies=[Depends(require_admin)])
+def stop_profile():
+    session = profiling.stop()
+    if session is None:
+        raise HTTPException(status_code=409, detail="No profile is running")
+    return session.status()
+
+@app.get("/api/admin/profile/download", dependencies=[Depends(require_admin)])
+def download_profile():
+    session = profiling.current()
+    if session is None or session.running:
+        raise HTTPException(status_code=409, detail="No finished profile to download")
+    if not session.ready:
+        raise HTTPException(status_code=409, detail="The profile is still being built, retry shortly")
+    if session.artifact is None:
+        raise HTTPException(status_code=500, detail="Building the profile failed")
+    return Response(session.artifact, media_type="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="slopchop-profile-{session.id}.zip"'})
+
 # --- LOCATION ENDPOINT (The Fix) ---
+def build_location_feed(latitude: float, longitude: float, session: Optional[str] = None) -> dict:
+    """Blocking pipeline behind /api/submit-location; runs as a background job."""
+    # 1. Convert Coords
+    geo_location = coords_to_geo(latitude, longitude)
+    print(f"🌎 Converted to Geo: {geo_location}")
+    feed_prefetcher.record_request(geo_location)
+
+    if session:
+        feed_store.bind_session(session, geo_location)
+
+    # 2. Call API, or share the feed already built for this geo
+    with STAGE_SECONDS.labels("location_feed").time():
+        response = feed_store.get_or_build(
+            geo_location, lambda: profiling.run("trend_posts", get_trending_posts, geo_location, 10, 1)
+        )
+
+    # 3. SAFETY CHECK (Critical Fix 2)
+    # Check if response exists AND has the "posts" key
+    if not (response and "posts" in response):
+        raise RuntimeError("No data found for location")
+
+    return {"geo": geo_location, "count": len(response["posts"])}
+
 @app.post("/api/submit-location")
-async def receive_location(loc: LocationData):
-    global newsData
-    
+async def receive_location(loc: LocationData, wait: bool = False):
     print(f"📍 RECEIVED COORDINATES: {loc.latitude}, {loc.longitude}")
-    
-    try:
-        # 1. Convert Coords
-        geo_location = coords_to_geo(loc.latitude, loc.longitude)
-        print(f"🌎 Converted to Geo: {geo_location}")
-
-        # 2. Call API (Store response first)
-        response = get_trending_posts(geo_location, 10, 1)
 
-        # 3. SAFETY CHECK (Critical Fix 2)
-        # Check if response exists AND has the "posts" key
-        if response and "posts" in response:
-            newsData = response["posts"]
-        else:
-            newsData = [] # Clear old data if fails
-            return {"status": "error", "message": "No data found for location"}
+    # The pipeline blocks on HTTP and inference, so it never runs on the event loop
+    job = job_registry.submit(
+        "location-feed", build_location_feed,
+        latitude=loc.latitude, longitude=loc.longitude, session=loc.session,
+    )
+    # Answer 202 at once; the client polls /api/jobs/{id} and then reads /api/news
+    if not wait:
+        return JSONResponse(
+            {"status": "accepted", "job_id": job.id, "status_url": f"/api/jobs/{job.id}"},
+            status_code=202,
+        )
 
+    # wait=true keeps the old request/response behaviour without blocking the loop
+    try:
+        result = await asyncio.wrap_future(job.future)
     except Exception as e:
         print(f"Error occurred while fetching trending posts: {e}")
-        return {"status": "error", "detail": str(e)}
+        return {"status": "error", "detail": str(e), "job_id": job.id}
+    return {"status": "ok", "job_id": job.id, **result}
+
+# --- JOB STATUS ---
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return {**job.to_dict(), "result": job.result}
 
 # --- NEWS GETTER ---
 @app.get("/api/news")
-def get_news():
-    return newsData
\ No newline at end of file
+def get_news(geo: Optional[str] = None, session: Optional[str] = None,
+             lat: Optional[float] = None, lon: Optional[float] = None):
+    # Resolve which geo's feed to serve: explicit geo, the session's geo or
+    # the caller's coordinates. Nothing else: another user's geo is not ours to serve
+    explicit = bool(geo)
+    if not geo and session:
+        geo = feed_store.geo_for_session(session)
+    if not geo and lat is not None and lon is not None:
+        try:
+            geo = coords_to_geo(lat, lon)
+        except ValueError:
+            geo = None
+    if not geo:
+        return []
+    # Raw client geo strings (e.g. "ZZ") must not take prefetch slots; resolved ones are fine
+    if not explicit or geo.upper().strip() in trends.TRENDS_GEOS:
+        feed_prefetcher.record_request(geo)
+
+    feed = feed_store.get(geo, allow_stale=True)
+    return feed["posts"] if feed else []
+
+# --- FEED STORE STATS ---
+@app.get("/api/stats/feeds")
+def get_feed_store_stats():
+    return {**feed_store.stats(), "jobs": job_registry.stats(), "trends": trends.stats(), "geocoder": geocoder.stats(),
+            "prefetch": feed_prefetcher.stats()}
@@ -15,3 +15,4 @@ class PostData(BaseModel):
 class LocationData(BaseModel):
     latitude: float
     longitude: float
+    session: Optional[str] = None
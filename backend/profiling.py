@@ -0,0 +1,375 @@
+"""
+On-demand profiling of live feed generation, for admins.
+
+An admin starts a session (see the /api/admin/profile endpoints in main) that
+covers either the next N profiled requests or a fixed time window:
+
+  "sample"    A daemon thread snapshots every thread's stack at a fixed
+              interval while a profiled request is in flight (or for the
+              whole window in time mode). Cheap enough for production and it
+              sees the worker pools too: X topic searches, image downloads and
+              the inference scheduler's batches. Output is a collapsed-stack
+              file (one "frame;frame;frame count" line per stack) for
+              flamegraph.pl, speedscope or inferno.
+  "cprofile"  Deterministic cProfile of each profiled request on its own
+              thread. Exact call counts, but work handed to other threads
+              only shows up as waiting. Output is a pstats .prof file plus a
+              text summary.
+
+With `torch=true` each model forward pass in ai_engine also runs under
+torch.profiler, and the operator-level CPU times are summed across passes.
+
+When no session is running the hooks cost a single global read: no
+profiler, trace function or sampling thread exists. Without
+SLOPCHOP_ADMIN_TOKEN the admin endpoints are off and no session can start.
+"""
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+from typing import Any, Callable, ContextManager, Dict, Optional
+
+ADMIN_TOKEN = os.getenv("SLOPCHOP_ADMIN_TOKEN", "")
+"""Shared secret for the admin endpoints; empty disables them."""
+
+PROFILE_MAX_S = float(os.getenv("SLOPCHOP_PROFILE_MAX_S", "300"))
+"""Hard cap on a session's length, so a request-count session cannot linger forever."""
+
+PROFILE_MAX_STACK_DEPTH = 128
+MODES = ("sample", "cprofile")
+
+_NULL = contextlib.nullcontext()
+_active: Optional["ProfileSession"] = None
+_last: Optional["ProfileSession"] = None
+_state_lock = threading.Lock()
+
+
+def _frame_label(code: Any) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class ProfileSession:
+    """
+    One profiling run; finishes after `max_requests` profiled requests or
+    `duration_s` seconds, whichever comes first (PROFILE_MAX_S at most).
+
+    Args:
+        mode: "sample" or "cprofile".
+        max_requests: Profiled requests to cover, or None for a pure time window.
+        duration_s: Time window in seconds, or None to stop on `max_requests` only.
+        interval_s: Stack sampling interval ("sample" mode).
+        torch_ops: Also collect PyTorch operator timings from forward passes.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        max_requests: Optional[int],
+        duration_s: Optional[float],
+        interval_s: float = 0.005,
+        torch_ops: bool = False,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        if max_requests is None and duration_s is None:
+            raise ValueError("give a request count, a duration, or both")
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.max_requests = max_requests
+        self.duration_s = min(duration_s if duration_s is not None else PROFILE_MAX_S, PROFILE_MAX_S)
+        self.interval_s = max(0.001, interval_s)
+        self.torch_ops = torch_ops
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.artifact: Optional[bytes] = None
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()  # no more collection
+        self._done = threading.Event()  # artifact built (or failed), session published as _last
+        self._claimed = 0
+        self._completed = 0
+        self._in_flight = 0
+        self._requests: Counter = Counter()  # name -> profiled requests
+        self._profiles: list = []
+        self._profile_busy = 0
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._torch_lock = threading.Lock()
+        self._torch_ops: Dict[str, list] = {}  # op -> [calls, self_cpu_us, cpu_us]
+        self._torch_passes: Counter = Counter()
+        self._torch_busy = 0
+
+        self._timer = threading.Timer(self.duration_s, self.finish)
+        self._timer.name = f"profile-timer-{self.id}"
+        self._timer.daemon = True
+        self._sampler: Optional[threading.Thread] = None
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        self._timer.start()
+        if self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, name=f"profile-sampler-{self.id}", daemon=True)
+            self._sampler.start()
+
+    def finish(self) -> None:
+        """
+        Stop collecting (idempotent). The artifact is built on the timer thread
+        or a short-lived one, never on the profiled request's thread, and the
+        session only counts as finished once its artifact is there.
+        """
+        with _state_lock:
+            if self._stopping.is_set():
+                return
+            self._stopping.set()
+        self._timer.cancel()
+        if threading.current_thread() is self._timer:
+            self._finalize()
+        else:
+            threading.Thread(target=self._finalize, name=f"profile-finish-{self.id}", daemon=True).start()
+
+    def _finalize(self) -> None:
+        global _active, _last
+        if self._sampler is not None:
+            self._sampler.join(timeout=2)
+        self.finished_at = time.time()
+        try:
+            self.artifact = self._build_artifact()
+        except Exception as e:
+            print(f"Building profile {self.id} failed: {e}")
+        with _state_lock:
+            self._done.set()
+            if _active is self:
+                _active = None
+            _last = self
+
+    @property
+    def running(self) -> bool:
+        """Still collecting samples / profiles."""
+        return not self._stopping.is_set()
+
+    @property
+    def ready(self) -> bool:
+        """Finished and its artifact (if it could be built) is available."""
+        return self._done.is_set()
+
+    # --- request hooks ---
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._stopping.is_set():
+                return False
+            if self.max_requests is not None and self._claimed >= self.max_requests:
+                return False
+            self._claimed += 1
+            self._in_flight += 1
+            return True
+
+    def _release(self, name: str) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._requests[name] += 1
+            last = self.max_requests is not None and self._completed >= self.max_requests
+        if last:
+            self.finish()
+
+    def run(self, name: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        if not self._claim():
+            return fn(*args, **kwargs)
+        try:
+            if self.mode != "cprofile":
+                return fn(*args, **kwargs)
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # another profiler owns this interpreter (3.12+ sys.monitoring)
+                with self._lock:
+                    self._profile_busy += 1
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._profiles.append(profile)
+        finally:
+            self._release(name)
+
+    # --- stack sampling ---
+
+    def _should_sample(self) -> bool:
+        return self.max_requests is None or self._in_flight > 0
+
+    def _sample_loop(self) -> None:
+        own = {threading.get_ident(), self._timer.ident}
+        while not self._stopping.wait(self.interval_s):
+            if not self._should_sample():
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            stacks = []
+            for ident, frame in frames.items():
+                if ident in own:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < PROFILE_MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks.append(";".join(reversed(labels)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+
+    # --- torch operator timing ---
+
+    def torch_scope(self, label: str) -> ContextManager[Any]:
+        if not self._should_sample():
+            return _NULL
+        # Only one torch.profiler can run at a time; concurrent passes are counted as busy
+        if not self._torch_lock.acquire(blocking=False):
+            with self._lock:
+                self._torch_busy += 1
+            return _NULL
+        return self._torch_profile(label)
+
+    @contextlib.contextmanager
+    def _torch_profile(self, label: str) -> Any:
+        try:
+            from torch.profiler import ProfilerActivity, profile
+
+            with profile(activities=[ProfilerActivity.CPU]) as prof:
+                yield
+            events = prof.key_averages()
+            with self._lock:
+                self._torch_passes[label] += 1
+                for ev in events:
+                    row = self._torch_ops.setdefault(ev.key, [0, 0.0, 0.0])
+                    row[0] += ev.count
+                    row[1] += ev.self_cpu_time_total
+                    row[2] += ev.cpu_time_total
+        finally:
+            self._torch_lock.release()
+
+    # --- output ---
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "mode": self.mode,
+                "running": self.running,
+                "ready": self.ready,
+                "max_requests": self.max_requests,
+                "duration_s": self.duration_s,
+                "interval_s": self.interval_s if self.mode == "sample" else None,
+                "torch_ops": self.torch_ops,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "requests": dict(self._requests),
+                "in_flight": self._in_flight,
+                "samples": self._samples,
+                "profile_busy": self._profile_busy,
+                "torch_passes": dict(self._torch_passes),
+                "torch_busy": self._torch_busy,
+                "artifact_bytes": len(self.artifact) if self.artifact is not None else None,
+            }
+
+    def _torch_table(self) -> str:
+        rows = sorted(self._torch_ops.items(), key=lambda kv: kv[1][1], reverse=True)
+        total_self = sum(r[1] for _, r in rows) or 1.0
+        out = [f"{'operator':<48} {'calls':>8} {'self CPU ms':>12} {'self %':>7} {'CPU total ms':>13}"]
+        for name, (calls, self_us, cpu_us) in rows:
+            out.append(f"{name[:48]:<48} {calls:>8} {self_us / 1000:>12.3f} {self_us / total_self * 100:>6.1f}% {cpu_us / 1000:>13.3f}")
+        return "\n".join(out) + "\n"
+
+    def _build_artifact(self) -> bytes:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            summary = self.status()
+            for key in ("artifact_bytes", "ready"):
+                summary.pop(key)
+            zf.writestr("summary.json", json.dumps(summary, indent=2, sort_keys=True))
+            if self.mode == "sample":
+                zf.writestr("stacks.collapsed", "".join(f"{stack} {n}\n" for stack, n in self._stacks.most_common()))
+            elif self._profiles:
+                stats = pstats.Stats(*self._profiles)
+                with tempfile.NamedTemporaryFile(suffix=".prof") as tmp:
+                    stats.dump_stats(tmp.name)
+                    zf.write(tmp.name, "profile.prof")
+                text = io.StringIO()
+                stats.stream = text
+                stats.sort_stats("cumulative").print_stats(60)
+                zf.writestr("profile.txt", text.getvalue())
+            if self._torch_ops:
+                zf.writestr("torch_ops.txt", self._torch_table())
+        return buf.getvalue()
+
+
+# --- hooks called from the hot path ---
+
+def run(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call `fn`, profiling it when a session is running."""
+    session = _active
+    if session is None:
+        return fn(*args, **kwargs)
+    return session.run(name, fn, args, kwargs)
+
+
+def torch_ops(label: str) -> ContextManager[Any]:
+    """Context manager for one model forward pass; a shared no-op unless a torch session runs."""
+    session = _active
+    if session is None or not session.torch_ops:
+        return _NULL
+    return session.torch_scope(label)
+
+
+# --- session control (admin endpoints) ---
+
+def start(
+    mode: str = "sample",
+    max_requests: Optional[int] = None,
+    duration_s: Optional[float] = None,
+    interval_s: float = 0.005,
+    torch_ops: bool = False,
+) -> ProfileSession:
+    """
+    Start a session.
+
+    Raises:
+        ValueError: On bad arguments.
+        RuntimeError: If a session is already running.
+    """
+    global _active
+    session = ProfileSession(mode, max_requests, duration_s, interval_s, torch_ops)
+    with _state_lock:
+        if _active is not None:
+            raise RuntimeError(f"profile {_active.id} is still running")
+        _active = session
+    session.start()
+    return session
+
+
+def stop() -> Optional[ProfileSession]:
+    """Finish the running session early; returns it (or None if none was running)."""
+    session = _active
+    if session is not None:
+        session.finish()
+    return session
+
+
+def current() -> Optional[ProfileSession]:
+    """The running session, else the last finished one."""
+    return _active or _last
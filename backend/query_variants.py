@@ -0,0 +1,151 @@
+"""
+Learned ordering of X search query variants.
+
+Every trend topic is searched with a list of query variants from strict to
+loose. Which of them actually return usable media tweets depends mostly on
+the topic's shape (a single token, a multi-word phrase, a hashtag), so hit
+and miss counts are kept per (shape, variant) and persisted as a small JSON
+file. Variants are then tried in order of their smoothed hit rate, and those
+that have never produced a hit after enough tries are skipped, except for an
+occasional exploration pass so they can recover if the API behaves
+differently later. Set SLOPCHOP_VARIANT_STATS=off to disable persistence.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_STATS_PATH = Path(__file__).resolve().parent / ".cache" / "query_variants.json"
+VARIANT_STATS = os.getenv("SLOPCHOP_VARIANT_STATS", str(DEFAULT_STATS_PATH))
+VARIANT_ADAPTIVE = os.getenv("SLOPCHOP_VARIANT_ADAPTIVE", "1") != "0"
+# A variant with this many tries and no hit for a topic shape is skipped...
+VARIANT_SKIP_AFTER = int(os.getenv("SLOPCHOP_VARIANT_SKIP_AFTER", "20"))
+# ...except on this fraction of searches, which still try it.
+VARIANT_EXPLORE_RATE = float(os.getenv("SLOPCHOP_VARIANT_EXPLORE_RATE", "0.05"))
+_SAVE_INTERVAL_S = 30.0
+
+
+def topic_shape(topic: str) -> str:
+    """Coarse topic class the stats are kept per: hashtag, single or multi."""
+    t = (topic or "").strip()
+    if t.startswith("#"):
+        return "hashtag"
+    return "multi" if len(t.split()) > 1 else "single"
+
+
+class VariantStats:
+    """
+    Per (topic shape, variant kind) counts of searches and hits.
+
+    Args:
+        path: JSON file the counts are loaded from and saved to, or None to
+            keep them in memory only.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, List[int]]] = {}
+        self._dirty = False
+        self._saved_at = 0.0
+        self._rng = random.Random()
+        self.skipped = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Ignoring unreadable query variant stats {self.path}: {e}")
+            return
+        for shape, kinds in (raw.get("counts") or {}).items():
+            for kind, (tries, hits) in kinds.items():
+                self._counts.setdefault(shape, {})[kind] = [int(tries), int(hits)]
+
+    def save(self, force: bool = False) -> None:
+        """Write the counts out if they changed (at most every few seconds unless `force`)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty or (not force and time.time() - self._saved_at < _SAVE_INTERVAL_S):
+                return
+            payload = json.dumps({"counts": self._counts}, sort_keys=True)
+            self._dirty = False
+            self._saved_at = time.time()
+        try:
+            path = Path(self.path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"Failed to save query variant stats {self.path}: {e}")
+
+    def record(self, shape: str, kind: str, hit: bool) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(shape, {}).setdefault(kind, [0, 0])
+            counts[0] += 1
+            counts[1] += int(hit)
+            self._dirty = True
+        self.save()
+
+    def order(self, shape: str, variants: Sequence[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Reorder `(kind, query)` variants for a topic of `shape`.
+
+        Variants are sorted by (hits + 1) / (tries + 2), so unseen variants
+        start at 0.5 and ties keep the strict-to-loose order. Variants with
+        VARIANT_SKIP_AFTER tries and no hit are dropped unless this call
+        explores. At least one variant is always returned.
+        """
+        if not VARIANT_ADAPTIVE or not variants:
+            return list(variants)
+
+        with self._lock:
+            counts = dict(self._counts.get(shape, {}))
+            explore = self._rng.random() < VARIANT_EXPLORE_RATE
+
+        def rate(kind: str) -> float:
+            tries, hits = counts.get(kind, (0, 0))
+            return (hits + 1) / (tries + 2)
+
+        ranked = sorted(enumerate(variants), key=lambda iv: (-rate(iv[1][0]), iv[0]))
+        ordered = [v for _, v in ranked]
+        if explore:
+            return ordered
+
+        kept = [v for v in ordered if not (counts.get(v[0], (0, 0))[0] >= VARIANT_SKIP_AFTER and counts[v[0]][1] == 0)]
+        if not kept:
+            kept = ordered[:1]
+        with self._lock:
+            self.skipped += len(ordered) - len(kept)
+        return kept
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "adaptive": VARIANT_ADAPTIVE,
+                "skipped": self.skipped,
+                "shapes": {
+                    shape: {
+                        kind: {"tries": tries, "hits": hits, "hit_rate": round(hits / tries, 4) if tries else 0.0}
+                        for kind, (tries, hits) in kinds.items()
+                    }
+                    for shape, kinds in self._counts.items()
+                },
+            }
+
+
+stats = VariantStats(None if VARIANT_STATS.lower() in ("", "off", "none") else VARIANT_STATS)
+atexit.register(stats.save, force=True)
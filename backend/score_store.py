@@ -0,0 +1,124 @@
+"""
+Persistent, content-addressed score store.
+
+Scores are kept in one SQLite file keyed by (kind, model version, sha256 of the
+scored content), so every uvicorn worker shares them and they survive restarts.
+WAL mode lets many readers run alongside the single writer per job kind.
+Set SLOPCHOP_SCORE_DB=off to disable persistence.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / ".cache" / "scores.sqlite3"
+SCORE_DB = os.getenv("SLOPCHOP_SCORE_DB", str(DEFAULT_DB_PATH))
+
+_SQLITE_MAX_VARS = 500
+
+
+def content_key(content: str) -> str:
+    """Stable content address for a caption, url or any other scored string."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ScoreStore:
+    """
+    SQLite-backed map of (kind, model, content) -> float score.
+
+    Args:
+        path: Database file, or None for a disabled store that never hits.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._errors = 0
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                " kind TEXT NOT NULL, model TEXT NOT NULL, key TEXT NOT NULL,"
+                " value REAL NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (kind, model, key)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, kind: str, model: str, contents: Iterable[str]) -> Dict[str, float]:
+        """Return the stored score for every content that has one."""
+        by_key = {content_key(c): c for c in contents}
+        found: Dict[str, float] = {}
+        try:
+            conn = self._conn()
+            if conn is not None:
+                keys = list(by_key)
+                for start in range(0, len(keys), _SQLITE_MAX_VARS):
+                    chunk = keys[start:start + _SQLITE_MAX_VARS]
+                    rows = conn.execute(
+                        "SELECT key, value FROM scores WHERE kind = ? AND model = ?"
+                        f" AND key IN ({','.join('?' * len(chunk))})",
+                        (kind, model, *chunk),
+                    )
+                    for key, value in rows:
+                        found[by_key[key]] = value
+        except sqlite3.Error as e:
+            print(f"Score store read failed: {e}")
+            with self._stats_lock:
+                self._errors += 1
+
+        with self._stats_lock:
+            self._hits += len(found)
+            self._misses += len(by_key) - len(found)
+        return found
+
+    def put_many(self, kind: str, model: str, scores: Mapping[str, float]) -> None:
+        if not scores:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            if conn is None:
+                return
+            conn.executemany(
+                "INSERT OR REPLACE INTO scores (kind, model, key, value, created) VALUES (?, ?, ?, ?, ?)",
+                [(kind, model, content_key(c), float(v), now) for c, v in scores.items()],
+            )
+        except sqlite3.Error as e:
+            print(f"Score store write failed: {e}")
+            with self._stats_lock:
+                self._errors += 1
+            return
+
+        with self._stats_lock:
+            self._writes += len(scores)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "path": self.path,
+                "hits": self._hits,
+                "misses": self._misses,
+                "writes": self._writes,
+                "errors": self._errors,
+            }
+
+
+store = ScoreStore(None if SCORE_DB.lower() in ("", "off", "none") else SCORE_DB)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_REGISTRY: Dict[str, "TTLCache[Any]"] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """
+    Cheap recursive estimate of an object's memory footprint in bytes.
+
+    Walks dicts, lists, tuples and sets a few levels deep; anything else is
+    counted with `sys.getsizeof`. Good enough for budgeting, not exact.
+    """
+    size = sys.getsizeof(obj)
+    if _depth >= 4:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approx_size(item, _depth + 1)
+    return size
+
+
+def _env_number(name: str, default: Optional[float]) -> Optional[float]:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    if raw.strip().lower() in ("none", "off", "unlimited"):
+        return None
+    return float(raw)
+
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe LRU cache with TTL expiry, entry/byte budgets and counters.
+
+    Entries are fresh for `ttl_s` seconds. They are then kept for another
+    `stale_ttl_s` seconds, during which only `get_stale` returns them (e.g. as
+    a fallback when upstream fails), and dropped afterwards. Expired entries
+    are swept periodically on writes, so memory does not depend on reads.
+
+    Args:
+        name: Label used in stats and for env overrides.
+        ttl_s: Freshness window in seconds, or None to never expire.
+        stale_ttl_s: Extra retention after `ttl_s` for stale reads.
+        max_entries: Entry budget, or None for unbounded.
+        max_bytes: Approximate byte budget (see `approx_size`), or None.
+        sizeof: Size estimator used for the byte budget.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_s: Optional[float] = None,
+        stale_ttl_s: float = 0.0,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = approx_size,
+    ) -> None:
+        self.name = name
+        self.ttl_s = ttl_s
+        self.stale_ttl_s = stale_ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Tuple[float, V, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._next_sweep = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        with _REGISTRY_LOCK:
+            _REGISTRY[name] = self
+
+    @classmethod
+    def from_env(
+        cls,
+        name: str,
+        ttl_s: Optional[float] = None,
+        stale_ttl_s: float = 0.0,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> "TTLCache[V]":
+        """
+        Build a cache whose budget can be overridden per cache from env vars:
+        SLOPCHOP_CACHE_<NAME>_TTL_S, _STALE_TTL_S, _MAX_ENTRIES, _MAX_BYTES.
+        """
+        prefix = f"SLOPCHOP_CACHE_{name.upper()}_"
+        max_entries_env = _env_number(prefix + "MAX_ENTRIES", max_entries)
+        max_bytes_env = _env_number(prefix + "MAX_BYTES", max_bytes)
+        return cls(
+            name,
+            ttl_s=_env_number(prefix + "TTL_S", ttl_s),
+            stale_ttl_s=_env_number(prefix + "STALE_TTL_S", stale_ttl_s) or 0.0,
+            max_entries=None if max_entries_env is None else int(max_entries_env),
+            max_bytes=None if max_bytes_env is None else int(max_bytes_env),
+        )
+
+    def _age_limit(self) -> Optional[float]:
+        return None if self.ttl_s is None else self.ttl_s + self.stale_ttl_s
+
+    def _lookup(self, key: Hashable, max_age: Optional[float]) -> Tuple[bool, Optional[V], float]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None, 0.0
+        stored_at, value, _ = entry
+        age = time.time() - stored_at
+        if max_age is not None and age >= max_age:
+            return False, None, age
+        self._data.move_to_end(key)
+        return True, value, age
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        """Return a fresh value, or `default`."""
+        with self._lock:
+            found, value, _ = self._lookup(key, self.ttl_s)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def get_stale(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        """Return a value that is fresh or still inside its stale window, or `default`."""
+        with self._lock:
+            found, value, age = self._lookup(key, self._age_limit())
+            if found:
+                if self.ttl_s is not None and age >= self.ttl_s:
+                    self.stale_hits += 1
+                return value
+            return default
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since `key` was stored, or None if it is not held."""
+        with self._lock:
+            entry = self._data.get(key)
+            return None if entry is None else time.time() - entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key, self.ttl_s)[0]
+
+    def set(self, key: Hashable, value: V) -> None:
+        size = self._sizeof(value) + self._sizeof(key)
+        now = time.time()
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (now, value, size)
+            self._bytes += size
+            self._maybe_sweep(now)
+            self._enforce_budget()
+
+    def pop(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[2]
+            return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _maybe_sweep(self, now: float) -> None:
+        limit = self._age_limit()
+        if limit is None or now < self._next_sweep:
+            return
+        self._next_sweep = now + max(limit / 4, 1.0)
+        for key in [k for k, (stored_at, _, _) in self._data.items() if now - stored_at >= limit]:
+            self._bytes -= self._data.pop(key)[2]
+            self.expirations += 1
+
+    def _enforce_budget(self) -> None:
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "stale_ttl_s": self.stale_ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def all_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every cache created in this process, by name."""
+    with _REGISTRY_LOCK:
+        caches = list(_REGISTRY.values())
+    return {c.name: c.stats() for c in caches}
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.cache import TTLCache
+from src.trends import TRENDS_GEOS
+
+DEFAULT_BOUNDARIES_PATH = Path(__file__).resolve().parent / "geodata" / "countries.geojson"
+GEO_BOUNDARIES = os.getenv("SLOPCHOP_GEO_BOUNDARIES", str(DEFAULT_BOUNDARIES_PATH))
+"""
+GeoJSON FeatureCollection of (Multi)Polygons with a Google Trends geo code in
+`properties.geo` (or `ISO_A2` / `iso_a2`, as in Natural Earth exports).
+The bundled file holds hand-simplified outlines for the most requested Trends
+geos only (see `stats()["missing_trends_geos"]`); points in any other country
+resolve to no geo. The US borders with Canada and Mexico follow the real line
+closely, other borders only to a few tens of kilometres. Point this at a
+Natural Earth admin-0 export for full coverage.
+"""
+
+GEOHASH_PRECISION = int(os.getenv("SLOPCHOP_GEOHASH_PRECISION", "6"))
+"""Geohash length results are cached by; 6 chars is a ~1.2 x 0.6 km cell."""
+
+BORDER_KM = float(os.getenv("SLOPCHOP_GEOCODER_BORDER_KM", "60"))
+"""Points outside every outline but this close to one (islands, coasts drawn too tight) get its geo."""
+
+CENSUS_FALLBACK = os.getenv("SLOPCHOP_GEOCODER_CENSUS_FALLBACK", "0") == "1"
+"""Opt-in: also ask the US Census geocoder (network, blocking) about points near a US outline."""
+
+_GRID_DEG = 1.0
+_KM_PER_DEG = 111.2
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+Ring = List[Tuple[float, float]]
+
+
+def geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash of a point."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars: List[str] = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def _point_in_ring(lon: float, lat: float, ring: Sequence[Tuple[float, float]]) -> bool:
+    """Even-odd ray casting test."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _ring_distance_km(lon: float, lat: float, ring: Sequence[Tuple[float, float]]) -> float:
+    """Shortest distance from the point to the ring's edges, on a local equirectangular projection."""
+    kx = _KM_PER_DEG * math.cos(math.radians(lat))
+    best = math.inf
+    for (x1, y1), (x2, y2) in zip(ring, list(ring[1:]) + [ring[0]]):
+        ax, ay = (x1 - lon) * kx, (y1 - lat) * _KM_PER_DEG
+        bx, by = (x2 - lon) * kx, (y2 - lat) * _KM_PER_DEG
+        dx, dy = bx - ax, by - ay
+        seg = dx * dx + dy * dy
+        t = 0.0 if seg == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / seg))
+        best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+    return best
+
+
+def _ring_area(ring: Sequence[Tuple[float, float]]) -> float:
+    """Planar (shoelace) area in square degrees; only used to rank overlapping polygons."""
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, list(ring[1:]) + [ring[0]]):
+        area += x1 * y2 - x2 * y1
+    return abs(area) / 2
+
+
+class _Polygon:
+    __slots__ = ("geo", "outer", "holes", "bbox", "area")
+
+    def __init__(self, geo: str, outer: Ring, holes: List[Ring]) -> None:
+        self.geo = geo
+        self.outer = outer
+        self.holes = holes
+        xs = [x for x, _ in outer]
+        ys = [y for _, y in outer]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        self.area = _ring_area(outer) - sum(_ring_area(h) for h in holes)
+
+    def contains(self, lon: float, lat: float) -> bool:
+        min_x, min_y, max_x, max_y = self.bbox
+        if not (min_x <= lon <= max_x and min_y <= lat <= max_y):
+            return False
+        if not _point_in_ring(lon, lat, self.outer):
+            return False
+        return not any(_point_in_ring(lon, lat, h) for h in self.holes)
+
+    def distance_km(self, lon: float, lat: float) -> float:
+        return min(_ring_distance_km(lon, lat, ring) for ring in [self.outer, *self.holes])
+
+
+class ReverseGeocoder:
+    """
+    Point -> Google Trends geo code, from local boundary polygons.
+
+    Polygons are bucketed into a 1-degree grid by bounding box, so a lookup
+    only tests the few polygons whose box covers the point's cell. Where
+    coarse outlines overlap, the smallest containing polygon wins (an enclave
+    or small neighbour beats the big country around it). Results, and the
+    other geos whose outlines pass within BORDER_KM, are cached per geohash
+    cell; both only depend on the boundary data.
+
+    Args:
+        path: GeoJSON boundaries file, or None for an empty geocoder.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._polygons: List[_Polygon] = []
+        self._geos: set = set()
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._cache: TTLCache[Tuple[str, Tuple[str, ...]]] = TTLCache.from_env(
+            "geocode", ttl_s=None, max_entries=100000, max_bytes=16 * 1024 * 1024
+        )
+        self._load_lock = threading.Lock()
+        self._loaded = False
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            if self.path:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._index(json.load(f))
+            self._loaded = True
+
+    def _index(self, collection: Dict[str, Any]) -> None:
+        for feature in collection.get("features") or []:
+            props = feature.get("properties") or {}
+            geo = (props.get("geo") or props.get("ISO_A2") or props.get("iso_a2") or "").upper()
+            geometry = feature.get("geometry") or {}
+            if not geo or geo == "-99":
+                continue
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            for rings in polygons:
+                outer, *holes = [[(float(x), float(y)) for x, y, *_ in ring] for ring in rings]
+                self._add(_Polygon(geo, outer, holes))
+
+    def _add(self, polygon: _Polygon) -> None:
+        idx = len(self._polygons)
+        self._polygons.append(polygon)
+        self._geos.add(polygon.geo)
+        min_x, min_y, max_x, max_y = polygon.bbox
+        for cx in range(math.floor(min_x / _GRID_DEG), math.floor(max_x / _GRID_DEG) + 1):
+            for cy in range(math.floor(min_y / _GRID_DEG), math.floor(max_y / _GRID_DEG) + 1):
+                self._grid.setdefault((cx, cy), []).append(idx)
+
+    def _locate(self, lat: float, lon: float) -> Optional[str]:
+        cell = (math.floor(lon / _GRID_DEG), math.floor(lat / _GRID_DEG))
+        best: Optional[_Polygon] = None
+        for idx in self._grid.get(cell, ()):
+            polygon = self._polygons[idx]
+            if (best is None or polygon.area < best.area) and polygon.contains(lon, lat):
+                best = polygon
+        return best.geo if best is not None else None
+
+    def _nearby(self, lat: float, lon: float, km: float) -> List[str]:
+        dlat = km / _KM_PER_DEG
+        dlon = min(180.0, km / (_KM_PER_DEG * max(math.cos(math.radians(lat)), 0.01)))
+        distances: Dict[str, float] = {}
+        seen = set()
+        for cx in range(math.floor((lon - dlon) / _GRID_DEG), math.floor((lon + dlon) / _GRID_DEG) + 1):
+            for cy in range(math.floor((lat - dlat) / _GRID_DEG), math.floor((lat + dlat) / _GRID_DEG) + 1):
+                for idx in self._grid.get((cx, cy), ()):
+                    if idx in seen:
+                        continue
+                    seen.add(idx)
+                    polygon = self._polygons[idx]
+                    min_x, min_y, max_x, max_y = polygon.bbox
+                    if lon + dlon < min_x or lon - dlon > max_x or lat + dlat < min_y or lat - dlat > max_y:
+                        continue
+                    d = polygon.distance_km(lon, lat)
+                    if d <= km and d < distances.get(polygon.geo, math.inf):
+                        distances[polygon.geo] = d
+        return sorted(distances, key=distances.__getitem__)
+
+    def lookup_detail(self, lat: float, lon: float) -> Tuple[Optional[str], List[str]]:
+        """
+        Geo code of the polygon containing the point (or None), plus the other
+        geos whose outlines pass within BORDER_KM of it, nearest first.
+
+        Raises:
+            ValueError: If the coordinates are out of range.
+        """
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            raise ValueError(f"Coordinates out of range: lat={lat}, lon={lon}")
+        self._ensure_loaded()
+
+        key = geohash(lat, lon)
+        cached = self._cache.get(key)
+        if cached is None:
+            geo = self._locate(lat, lon)
+            near = tuple(g for g in self._nearby(lat, lon, BORDER_KM) if g != geo)
+            cached = (geo or "", near)
+            self._cache.set(key, cached)
+        return cached[0] or None, list(cached[1])
+
+    def lookup(self, lat: float, lon: float) -> Optional[str]:
+        """Geo code of the polygon containing the point, or None if none does."""
+        return self.lookup_detail(lat, lon)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "boundaries": self.path,
+            "polygons": len(self._polygons),
+            "geos": len(self._geos),
+            "missing_trends_geos": sorted(TRENDS_GEOS - self._geos),
+            "grid_cells": len(self._grid),
+            "border_km": BORDER_KM,
+            "census_fallback": CENSUS_FALLBACK,
+            "cache": self._cache.stats(),
+        }
+
+
+geocoder = ReverseGeocoder(None if GEO_BOUNDARIES.lower() in ("", "off", "none") else GEO_BOUNDARIES)
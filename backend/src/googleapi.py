@@ -2,85 +2,36 @@ from __future__ import annotations
 
 import time
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 import requests
 from fastapi import APIRouter, HTTPException, Query
 
-router = APIRouter(prefix="/trends", tags=["trends"])
-
-
-_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
-"""In-memory cache mapping geo -> (timestamp, payload)."""
-
-CACHE_TTL_SECONDS = 600
-"""Cache duration (seconds). Trends refresh ~every ~10 minutes on average. :contentReference[oaicite:2]{index=2}"""
-
-
-def _fetch_trends_rss_xml(geo: str, hl: str = "en-US") -> str:
-    """
-    Fetch Google Trends RSS XML for a given geo.
-
-    Args:
-        geo: Country/region code used by Google Trends RSS (e.g., "US").
-        hl: UI language/locale hint (e.g., "en-US").
-
-    Returns:
-        RSS XML response text.
-
-    Raises:
-        requests.HTTPError: If the upstream request returns a non-2xx response.
-    """
-    url = "https://trends.google.com/trending/rss"
-    r = requests.get(
-        url,
-        params={"geo": geo, "hl": hl},
-        headers={
-            "User-Agent": "HackNCSU2026/1.0 (contact: you@example.com)",
-            "Accept": "application/rss+xml, application/xml;q=0.9, text/xml;q=0.8, */*;q=0.1",
-            "Accept-Language": "en-US,en;q=0.9",
-        },
-        timeout=10,
-    )
-    r.raise_for_status()
-    return r.text
-
-
-def _parse_trends_rss(xml_text: str, limit: int) -> Dict[str, Any]:
-    """
-    Parse Google Trends RSS XML into a JSON-ready payload.
-
-    Args:
-        xml_text: RSS XML as string.
-        limit: Maximum number of items to include.
-
-    Returns:
-        Dict with 'updated' and 'trends' list.
-    """
-    root = ET.fromstring(xml_text)
+from src.cache import TTLCache
+from src.geocoder import CENSUS_FALLBACK, geocoder, geohash
+from src.metrics import CENSUS_LOOKUP_SECONDS, STAGE_SECONDS
+from src.trends import CACHE_TTL_SECONDS, TRENDS_GEOS, get_trends  # noqa: F401  (TTL re-exported for schedulers)
 
-    channel = root.find("channel")
-    if channel is None:
-        return {"updated": None, "trends": []}
-
-    updated = (channel.findtext("lastBuildDate") or channel.findtext("pubDate") or None)
-
-    items: List[Dict[str, Any]] = []
-    for item in channel.findall("item")[:limit]:
-        title = (item.findtext("title") or "").strip()
-        link = (item.findtext("link") or "").strip()
-        pub = (item.findtext("pubDate") or "").strip()
+router = APIRouter(prefix="/trends", tags=["trends"])
 
-        if title:
-            items.append({"title": title, "link": link, "published": pub or None})
+CENSUS_GEOCODER_URL = "https://geocoding.geo.census.gov/geocoder/geographies/coordinates"
 
-    return {"updated": updated, "trends": items}
+# Resolved geos per geohash cell; cells no geo could be found for are only
+# remembered briefly, and answers given while the Census lookup failed not at all
+_COORDS_GEO_CACHE: TTLCache[str] = TTLCache.from_env(
+    "coords_geo", ttl_s=None, max_entries=100000, max_bytes=8 * 1024 * 1024
+)
+_COORDS_MISS_CACHE: TTLCache[bool] = TTLCache.from_env(
+    "coords_geo_miss", ttl_s=10 * 60, max_entries=10000, max_bytes=1024 * 1024
+)
 
 
 def get_trends_by_geo(geo: str, limit: int = 20) -> Dict[str, Any]:
     """
     Get country-level trends for a geo code, with caching and robust errors.
 
+    Fetching, caching and parsing are shared with the X pipeline in src.trends.
+
     Args:
         geo: Country code like "US".
         limit: Number of trends to return.
@@ -91,22 +42,8 @@ def get_trends_by_geo(geo: str, limit: int = 20) -> Dict[str, Any]:
     Raises:
         HTTPException: For upstream/network issues.
     """
-    geo = geo.upper().strip()
-
-    now = time.time()
-    cached = _CACHE.get(geo)
-    if cached and (now - cached[0] < CACHE_TTL_SECONDS):
-        return cached[1]
-
     try:
-        xml_text = _fetch_trends_rss_xml(geo=geo)
-        parsed = _parse_trends_rss(xml_text, limit=limit)
-        payload = {
-            "geo": geo,
-            "updated": parsed["updated"],
-            "count": len(parsed["trends"]),
-            "trends": parsed["trends"],
-        }
+        return get_trends(geo, limit=limit)
     except requests.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Google Trends RSS request failed: {str(e)}") from e
     except ET.ParseError as e:
@@ -114,12 +51,10 @@ def get_trends_by_geo(geo: str, limit: int = 20) -> Dict[str, Any]:
     except requests.RequestException as e:
         raise HTTPException(status_code=502, detail=f"Network error fetching Google Trends RSS: {str(e)}") from e
 
-    _CACHE[geo] = (now, payload)
-    return payload
-
 
-def _coords_are_in_us(lat: float, lon: float) -> bool:
-    url = "https://geocoding.geo.census.gov/geocoder/geographies/coordinates"
+def _coords_are_in_us(lat: float, lon: float) -> Optional[bool]:
+    """Ask the Census geocoder whether the point is in a US state; None if the lookup failed."""
+    url = CENSUS_GEOCODER_URL
     params = {
         "x": lon,
         "y": lat,
@@ -128,15 +63,19 @@ def _coords_are_in_us(lat: float, lon: float) -> bool:
         "format": "json",
     }
 
+    started = time.perf_counter()
     try:
         r = requests.get(url, params=params, timeout=10)
         r.raise_for_status()
         data = r.json()
         geos = (((data.get("result") or {}).get("geographies")) or {})
         states = geos.get("States") or []
-        return bool(states)
+        in_us = bool(states)
     except Exception:
-        return False
+        CENSUS_LOOKUP_SECONDS.labels("error").observe(time.perf_counter() - started)
+        return None
+    CENSUS_LOOKUP_SECONDS.labels("us" if in_us else "not_us").observe(time.perf_counter() - started)
+    return in_us
 
 
 @router.get("/by-geo")
@@ -157,22 +96,68 @@ def trends_by_coord(
     limit: int = Query(20, ge=1, le=50, description="Number of trends to return (1–50)."),
 ) -> Dict[str, Any]:
     """
-    Convenience endpoint: if coords are in the US, return US trends.
+    Convenience endpoint: return trends for the geo containing the coords.
+
+    If the coords can't be resolved to a geo, this endpoint asks the caller
+    to use /by-geo instead.
+    """
+    try:
+        geo = coords_to_geo(lat, lon)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e} Use /trends/by-geo?geo=<COUNTRY_CODE> instead.") from e
+    return get_trends_by_geo(geo=geo, limit=limit)
+
+
+def _resolve_geo(lat: float, lon: float) -> Tuple[Optional[str], bool]:
+    """(geo or None, whether the answer is final enough to cache)."""
+    with STAGE_SECONDS.labels("coords_to_geo").time():
+        geo, near = geocoder.lookup_detail(lat, lon)
+    if geo is not None and geo not in TRENDS_GEOS:
+        return None, True  # inside a country Trends has no feed for
+    near = [g for g in near if g in TRENDS_GEOS]
+
+    # Opt-in: double-check points near a US border or coast with the Census geocoder
+    if CENSUS_FALLBACK and ("US" in near or (geo == "US" and near)):
+        in_us = _coords_are_in_us(lat, lon)
+        if in_us is None:
+            return geo or (near[0] if near else None), False
+        if in_us:
+            return "US", True
+        if geo == "US" or geo is None:
+            geo = next((g for g in near if g != "US"), None)
+        return geo, True
+
+    # Just outside every outline (a coast drawn too tight): take the nearest geo
+    return geo or (near[0] if near else None), True
 
-    If not in the US, this endpoint asks the caller to use /by-geo instead.
+
+def coords_to_geo(lat: float, lon: float) -> str:
     """
-    if _coords_are_in_us(lat, lon):
-        return get_trends_by_geo(geo="US", limit=limit)
+    Resolve coordinates to a Google Trends geo code with the offline geocoder
+    (no network unless CENSUS_FALLBACK is turned on).
 
-    raise HTTPException(
-        status_code=400,
-        detail="Coordinates appear to be outside the US (or could not be verified). "
-               "Use /trends/by-geo?geo=<COUNTRY_CODE> instead."
-    )
+    Args:
+        lat: Latitude in decimal degrees.
+        lon: Longitude in decimal degrees.
 
-def coords_to_geo(lat:float, lon:float) -> str:
-    if _coords_are_in_us(lat, lon):
-        return "US"
-    raise ValueError("Coordinates appear to be outside the US (or could not be verified). Only US is supported in this demo.")
+    Returns:
+        Geo code like "US" or "GB".
 
-print(get_trends_by_geo("US", limit=50))
\ No newline at end of file
+    Raises:
+        ValueError: If the coordinates are out of range or no known geo contains them.
+    """
+    key = geohash(lat, lon) if -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 else None
+    geo = _COORDS_GEO_CACHE.get(key) if key else None
+    if geo is None and not (key and _COORDS_MISS_CACHE.get(key)):
+        geo, final = _resolve_geo(lat, lon)
+        if final and geo:
+            _COORDS_GEO_CACHE.set(key, geo)
+        elif final:
+            _COORDS_MISS_CACHE.set(key, True)
+    if geo is None:
+        raise ValueError(f"Coordinates ({lat}, {lon}) are not inside any supported Google Trends geo.")
+    return geo
+
+
+if __name__ == "__main__":
+    print(get_trends_by_geo("US", limit=50))
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cached lookup (~10 µs) up to a slow upstream call
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+BYTES_BUCKETS: Tuple[float, ...] = tuple(float(4 ** i * 1024) for i in range(1, 8))  # 4 KiB .. 16 MiB
+SIZE_BUCKETS: Tuple[float, ...] = (1, 2, 4, 8, 16, 32, 64, 128)
+
+Sample = Tuple[str, Dict[str, str], float]
+"""(metric name incl. suffix, labels, value) as produced by collectors."""
+
+_REGISTRY: List["_Metric"] = []
+_COLLECTORS: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Named family of children, one per label-value tuple."""
+
+    kind = ""
+    suffix = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY.append(self)
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: object) -> object:
+        """Child for these label values (positional, in `labelnames` order); created on first use."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in items]
+
+    def expose(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """Monotonic counter; exposed with a `_total` suffix."""
+
+    kind = "counter"
+    suffix = "_total"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def expose(self) -> Iterator[str]:
+        for labels, child in self._items():
+            yield f"{self.name}_total{_format_labels(labels)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: _HistogramChild) -> None:
+        self._child = child
+        self._started = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram with `_bucket`, `_sum` and `_count` series.
+
+    Args:
+        buckets: Upper bounds in ascending order; +Inf is implied.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(float(b) for b in buckets if not math.isinf(b)))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Observe on the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def expose(self) -> Iterator[str]:
+        for labels, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if math.isinf(bound) else _format_value(bound)
+                yield f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+def register_collector(name: str, kind: str, documentation: str, collect: Callable[[], Iterable[Sample]]) -> None:
+    """
+    Expose values that already live elsewhere (cache counters, queue depths)
+    by reading them at scrape time, so the hot path pays nothing for them.
+
+    Args:
+        name: Metric family name used for the HELP/TYPE header; every sample
+            must use it (counters included, so end it in `_total`).
+        kind: "counter" or "gauge".
+        collect: Returns (sample name, labels, value) tuples for the family.
+    """
+    with _REGISTRY_LOCK:
+        _COLLECTORS.append((name, kind, documentation, collect))
+
+
+def generate_latest() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+        collectors = list(_COLLECTORS)
+
+    lines: List[str] = []
+    for metric in metrics:
+        family = metric.name + metric.suffix
+        lines.append(f"# HELP {family} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {family} {metric.kind}")
+        lines.extend(metric.expose())
+    for name, kind, documentation, collect in collectors:
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"Metrics collector {name} failed: {e}")
+            continue
+        lines.append(f"# HELP {name} {_escape(documentation)}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{sample}{_format_labels(labels)} {_format_value(value)}" for sample, labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+def reset(names: Optional[Iterable[str]] = None) -> None:
+    """Drop recorded samples (all metrics, or only `names`); the metric definitions stay."""
+    wanted = None if names is None else set(names)
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    for metric in metrics:
+        if wanted is None or metric.name in wanted:
+            with metric._lock:
+                metric._children.clear()
+
+
+# --- Stage metrics shared across modules ---
+
+STAGE_SECONDS = Histogram(
+    "slopchop_stage_seconds",
+    "Time spent in one hot-path stage.",
+    ["stage"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "slopchop_http_request_seconds",
+    "API request latency by route template, method and status code.",
+    ["route", "method", "status"],
+)
+CENSUS_LOOKUP_SECONDS = Histogram(
+    "slopchop_census_lookup_seconds",
+    "US Census geocoder round trips by outcome (us, not_us, error).",
+    ["outcome"],
+)
+TRENDS_FETCH_SECONDS = Histogram(
+    "slopchop_trends_fetch_seconds",
+    "Google Trends RSS fetches by HTTP status (200, 304) or error.",
+    ["status"],
+)
+TRENDS_PARSE_SECONDS = Histogram(
+    "slopchop_trends_parse_seconds",
+    "Google Trends RSS parse passes.",
+)
+X_SEARCH_SECONDS = Histogram(
+    "slopchop_x_search_seconds",
+    "X recent-search attempts by query variant and outcome (ok, rate_limited, error).",
+    ["variant", "outcome"],
+)
+X_VARIANT_RESULTS = Counter(
+    "slopchop_x_variant_results",
+    "Completed X searches by query variant and whether they yielded media tweets (hit, empty).",
+    ["variant", "result"],
+)
+X_SEARCH_DENIED = Counter(
+    "slopchop_x_search_denied",
+    "X searches skipped because the rate-limit governor kept the calls for higher-priority topics.",
+)
+IMAGE_DOWNLOAD_SECONDS = Histogram(
+    "slopchop_image_download_seconds",
+    "Image downloads (request to last byte) by outcome (ok, error).",
+    ["outcome"],
+)
+IMAGE_DOWNLOAD_BYTES = Histogram(
+    "slopchop_image_download_bytes",
+    "Size of downloaded image bodies.",
+    buckets=BYTES_BUCKETS,
+)
+IMAGE_DECODE_SECONDS = Histogram(
+    "slopchop_image_decode_seconds",
+    "Image decode (and draft/reduce) time.",
+)
+TOKENIZE_SECONDS = Histogram(
+    "slopchop_tokenize_seconds",
+    "Caption tokenization per model call (all captions of the call, before padding).",
+    ["model"],
+)
+MODEL_FORWARD_SECONDS = Histogram(
+    "slopchop_model_forward_seconds",
+    "Batched model calls per model; an image-detector call covers its preprocessing and all its sub-batches.",
+    ["model"],
+)
+MODEL_BATCH_SIZE = Histogram(
+    "slopchop_model_batch_size",
+    "Items per model call.",
+    ["model"],
+    buckets=SIZE_BUCKETS,
+)
+
+
+def _cache_samples() -> Iterator[Sample]:
+    from src.cache import all_cache_stats
+
+    for name, s in all_cache_stats().items():
+        yield "slopchop_cache_requests_total", {"cache": name, "result": "hit"}, s["hits"]
+        yield "slopchop_cache_requests_total", {"cache": name, "result": "miss"}, s["misses"]
+        yield "slopchop_cache_requests_total", {"cache": name, "result": "stale_hit"}, s["stale_hits"]
+
+
+def _cache_gauge(field: str) -> Callable[[], Iterator[Sample]]:
+    def collect() -> Iterator[Sample]:
+        from src.cache import all_cache_stats
+
+        for name, s in all_cache_stats().items():
+            yield f"slopchop_cache_{field}", {"cache": name}, s[field]
+
+    return collect
+
+
+register_collector(
+    "slopchop_cache_requests_total",
+    "counter",
+    "TTLCache lookups by cache and result (hit, miss, stale_hit).",
+    _cache_samples,
+)
+register_collector("slopchop_cache_entries", "gauge", "Entries held per TTLCache.", _cache_gauge("entries"))
+register_collector("slopchop_cache_bytes", "gauge", "Approximate bytes held per TTLCache.", _cache_gauge("bytes"))
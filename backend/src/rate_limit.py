@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+import tweepy as tw
+
+RESERVE_PER_RANK = int(os.getenv("SLOPCHOP_X_RESERVE_PER_RANK", "1"))
+"""Calls held back per priority rank: topic #n only spends while more than n*RESERVE_PER_RANK remain."""
+
+MAX_RESERVED_RANK = 20
+
+WINDOW_S = 15 * 60
+"""Length of an X API rate-limit window."""
+
+
+class _Window:
+    __slots__ = ("limit", "remaining", "reset_at", "updated_at")
+
+    def __init__(self) -> None:
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: float = 0.0
+        self.updated_at: float = 0.0
+
+
+class CallBudget:
+    """Calls one unit of work (e.g. a prefetch build) may still make; see `call_budget`."""
+
+    __slots__ = ("max_calls", "used")
+
+    def __init__(self, max_calls: int) -> None:
+        self.max_calls = max_calls
+        self.used = 0
+
+
+_budget: ContextVar[Optional[CallBudget]] = ContextVar("x_call_budget", default=None)
+
+
+@contextlib.contextmanager
+def call_budget(max_calls: int) -> Iterator[CallBudget]:
+    """
+    Cap the calls granted to the code in this block (and to work it hands to
+    pools that copy the context) at `max_calls`; the governor refuses the rest.
+    """
+    budget = CallBudget(max_calls)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+class RateLimitGovernor:
+    """
+    Shared view of the X API rate-limit windows, fed by response headers.
+
+    Every response updates the endpoint's window from `x-rate-limit-limit`,
+    `x-rate-limit-remaining` and `x-rate-limit-reset`. Before a call, callers
+    ask `try_acquire` with their priority rank (0 = most important topic). The
+    remaining budget is spent by priority: rank n is refused once only
+    n * RESERVE_PER_RANK calls remain, so the last calls of a window go to the
+    top topics. Inside a `call_budget` block, calls past the budget are
+    refused too. A refused caller should serve cached or stale data at once
+    instead of sleeping until the window resets.
+    """
+
+    def __init__(self, reserve_per_rank: int = RESERVE_PER_RANK) -> None:
+        self.reserve_per_rank = reserve_per_rank
+        self._windows: Dict[str, _Window] = {}
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.denied = 0
+        self.budget_denied = 0
+        self.rate_limited = 0
+
+    def update_from_headers(self, endpoint: str, headers: Mapping[str, str]) -> None:
+        try:
+            limit = headers.get("x-rate-limit-limit")
+            remaining = headers.get("x-rate-limit-remaining")
+            reset = headers.get("x-rate-limit-reset")
+        except AttributeError:
+            return
+        if remaining is None and reset is None:
+            return
+        with self._lock:
+            w = self._windows.setdefault(endpoint, _Window())
+            if limit is not None:
+                w.limit = int(limit)
+            if remaining is not None:
+                w.remaining = int(remaining)
+            if reset is not None:
+                w.reset_at = float(reset)
+            w.updated_at = time.time()
+
+    def mark_exhausted(self, endpoint: str, reset_at: Optional[float]) -> None:
+        """Record a 429: nothing left until `reset_at` (epoch seconds)."""
+        with self._lock:
+            w = self._windows.setdefault(endpoint, _Window())
+            w.remaining = 0
+            if reset_at:
+                w.reset_at = float(reset_at)
+            elif w.reset_at <= time.time():
+                w.reset_at = time.time() + WINDOW_S
+            w.updated_at = time.time()
+            self.rate_limited += 1
+
+    def try_acquire(self, endpoint: str, priority: int = 0) -> bool:
+        """Reserve one call on `endpoint` for a caller of rank `priority`; never blocks."""
+        budget = _budget.get()
+        with self._lock:
+            if budget is not None and budget.used >= budget.max_calls:
+                self.budget_denied += 1
+                return False
+            granted = self._acquire_window(endpoint, priority)
+            if granted and budget is not None:
+                budget.used += 1
+            return granted
+
+    def _acquire_window(self, endpoint: str, priority: int) -> bool:
+        """try_acquire against the endpoint window alone; caller holds the lock."""
+        w = self._windows.get(endpoint)
+        now = time.time()
+        if w is not None and w.remaining is not None and now >= w.reset_at:
+            # Window rolled over: start the current one from the full limit until
+            # the next response tells us the real numbers
+            w.remaining = w.limit
+            w.reset_at += WINDOW_S * (int((now - w.reset_at) // WINDOW_S) + 1)
+        if w is None or w.remaining is None:
+            self.granted += 1
+            return True
+
+        floor = min(max(priority, 0), MAX_RESERVED_RANK) * self.reserve_per_rank
+        if w.remaining > floor:
+            w.remaining -= 1
+            self.granted += 1
+            return True
+        self.denied += 1
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                "granted": self.granted,
+                "denied": self.denied,
+                "budget_denied": self.budget_denied,
+                "rate_limited": self.rate_limited,
+                "reserve_per_rank": self.reserve_per_rank,
+                "windows": {
+                    endpoint: {
+                        "limit": w.limit,
+                        "remaining": w.remaining,
+                        "reset_at": w.reset_at,
+                        "reset_in_s": max(0.0, round(w.reset_at - now, 1)),
+                    }
+                    for endpoint, w in self._windows.items()
+                },
+            }
+
+
+governor = RateLimitGovernor()
+
+
+class GovernedClient(tw.Client):
+    """
+    tweepy Client that never sleeps on rate limits and reports every
+    response's rate-limit headers to the shared governor.
+    """
+
+    def __init__(self, *args: Any, governor: RateLimitGovernor = governor, **kwargs: Any) -> None:
+        kwargs["wait_on_rate_limit"] = False
+        super().__init__(*args, **kwargs)
+        self.governor = governor
+
+    def request(self, method, route, params=None, json=None, user_auth=False):
+        try:
+            response = super().request(method, route, params=params, json=json, user_auth=user_auth)
+        except tw.errors.TooManyRequests as e:
+            self.governor.update_from_headers(route, e.response.headers)
+            self.governor.mark_exhausted(route, getattr(e, "reset_time", None))
+            raise
+        except tw.errors.HTTPException as e:
+            self.governor.update_from_headers(route, e.response.headers)
+            raise
+        self.governor.update_from_headers(route, response.headers)
+        return response
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from src.cache import TTLCache
+from src.metrics import TRENDS_FETCH_SECONDS, TRENDS_PARSE_SECONDS
+
+TRENDS_RSS_URL = "https://trends.google.com/trending/rss"
+DEFAULT_UA = "HackNC-State2026/1.0 (contact: you@example.com)"
+
+CACHE_TTL_SECONDS = 600
+"""Freshness window per geo (seconds). Trends refresh roughly every 10 minutes."""
+
+TRENDS_GEOS = frozenset("""
+    AE AR AT AU AZ BA BD BE BG BH BO BR BY CA CH CL CM CO CR CY CZ DE DK DO DZ
+    EC EE EG ES ET FI FR GB GE GH GR GT HK HN HR HU ID IE IL IN IQ IS IT JM JO
+    JP KE KH KR KW KZ LB LK LT LU LV LY MA MD MK MM MN MT MX MY MZ NG NI NL NO
+    NP NZ OM PA PE PH PK PL PR PT PY QA RO RS RU SA SE SG SI SK SN SV TH TN TR
+    TT TW TZ UA UG US UY UZ VE VN YE ZA ZM ZW
+""".split())
+"""Country codes the Trends "Trending now" RSS serves; any other geo has no feed."""
+
+STALE_TTL_SECONDS = int(os.getenv("SLOPCHOP_TRENDS_STALE_TTL_S", str(60 * 60)))
+"""How long a stale feed may still be served while it is revalidated in the background."""
+
+TrendItem = Dict[str, Any]
+ItemFilter = Callable[[TrendItem], bool]
+Parsed = Tuple[Optional[str], Tuple[TrendItem, ...], bool]
+"""(channel updated date, items parsed so far, whether the whole body was parsed)."""
+
+_session = requests.Session()
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="trends-refresh")
+_refreshing: Set[str] = set()
+_refreshing_lock = threading.Lock()
+_parsed_lock = threading.Lock()
+
+_CACHE: TTLCache[Dict[str, Any]] = TTLCache.from_env(
+    "trends", ttl_s=CACHE_TTL_SECONDS, stale_ttl_s=STALE_TTL_SECONDS, max_entries=256, max_bytes=8 * 1024 * 1024
+)
+"""
+Per-geo cache entry: raw RSS body, its ETag/Last-Modified validators and
+its `parsed` state. Entries are shared by concurrent requests, so the parse
+state is an immutable Parsed tuple that is only ever replaced as a whole.
+"""
+
+_stats_lock = threading.Lock()
+_stats = {"fetches": 0, "not_modified": 0, "stale_served": 0, "refresh_errors": 0, "parses": 0}
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _local_name(tag: str) -> str:
+    """Return XML element local name, stripping namespace if present."""
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _fetch_rss(geo: str, previous: Optional[Dict[str, Any]] = None, hl: str = "en-US") -> Optional[Tuple[bytes, Dict[str, str]]]:
+    """
+    Fetch the Trends RSS for `geo`, conditionally if `previous` has validators.
+
+    Returns:
+        (body, validators), or None if the server answered 304 Not Modified.
+
+    Raises:
+        requests.RequestException: On network errors or non-2xx responses.
+    """
+    headers = {
+        "User-Agent": os.getenv("USER_AGENT", DEFAULT_UA),
+        "Accept": "application/rss+xml, application/xml, text/xml;q=0.9, */*;q=0.1",
+        "Accept-Language": "en-US,en;q=0.9",
+    }
+    if previous:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    _count("fetches")
+    started = time.perf_counter()
+    try:
+        r = _session.get(TRENDS_RSS_URL, params={"geo": geo, "hl": hl}, headers=headers, timeout=10)
+    except requests.RequestException:
+        TRENDS_FETCH_SECONDS.labels("error").observe(time.perf_counter() - started)
+        raise
+    TRENDS_FETCH_SECONDS.labels(r.status_code).observe(time.perf_counter() - started)
+    if r.status_code == 304 and previous:
+        _count("not_modified")
+        return None
+    r.raise_for_status()
+    validators = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+    return r.content, validators
+
+
+def _iter_rss(body: bytes) -> Iterator[Tuple[str, Any]]:
+    """
+    Incrementally parse an RSS body.
+
+    Yields ("lastBuildDate" | "pubDate", text) for the channel's dates and
+    ("item", {title, link, published}) for each item, in document order.
+    Stopping the iteration stops the parse.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the body is not well-formed XML.
+    """
+    path: List[str] = []
+    for event, el in ET.iterparse(BytesIO(body), events=("start", "end")):
+        name = _local_name(el.tag)
+        if event == "start":
+            path.append(name)
+            continue
+        path.pop()
+        if not path or path[-1] != "channel":
+            continue
+        if name in ("lastBuildDate", "pubDate"):
+            yield name, (el.text or "").strip() or None
+        elif name == "item":
+            fields = {_local_name(child.tag): (child.text or "").strip() for child in el}
+            yield "item", {
+                "title": fields.get("title", ""),
+                "link": fields.get("link", ""),
+                "published": fields.get("pubDate") or None,
+            }
+            el.clear()
+
+
+def _parse(entry: Dict[str, Any], want: int, keep: Optional[ItemFilter]) -> Parsed:
+    """
+    Parse `entry["body"]` until `want` items pass `keep` (or the feed ends) and
+    publish the result as `entry["parsed"]`, unless a concurrent parse already
+    got further. Returns the state now published.
+    """
+    _count("parses")
+    updated: Optional[str] = None
+    items: List[TrendItem] = []
+    matched = 0
+    complete = False
+    with TRENDS_PARSE_SECONDS.time():
+        for kind, value in _iter_rss(entry["body"]):
+            if kind == "lastBuildDate":
+                updated = value or updated
+            elif kind == "pubDate":
+                updated = updated or value
+            elif value["title"]:
+                items.append(value)
+                if keep is None or keep(value):
+                    matched += 1
+                    if matched >= want:
+                        break
+        else:
+            complete = True
+
+    parsed: Parsed = (updated, tuple(items), complete)
+    with _parsed_lock:
+        current: Parsed = entry["parsed"]
+        if current[2] or (len(current[1]) >= len(items) and not complete):
+            return current
+        entry["parsed"] = parsed
+    return parsed
+
+
+def _select(parsed: Parsed, limit: int, keep: Optional[ItemFilter]) -> Optional[List[TrendItem]]:
+    """Up to `limit` parsed items passing `keep`, or None if more of the body must be parsed first."""
+    _, items, complete = parsed
+    selected = [item for item in items if keep is None or keep(item)][:limit]
+    if len(selected) < limit and not complete:
+        return None
+    return selected
+
+
+def _load(geo: str, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    fetched = _fetch_rss(geo, previous)
+    if fetched is None:
+        entry = dict(previous)  # 304: same body, new freshness window
+    else:
+        body, validators = fetched
+        entry = {"body": body, **validators, "parsed": (None, (), False)}
+    _CACHE.set(geo, entry)
+    return entry
+
+
+def _refresh_in_background(geo: str, previous: Dict[str, Any]) -> None:
+    with _refreshing_lock:
+        if geo in _refreshing:
+            return
+        _refreshing.add(geo)
+
+    def run() -> None:
+        try:
+            _load(geo, previous)
+        except Exception as e:
+            _count("refresh_errors")
+            print(f"Background Trends refresh failed for {geo}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(geo)
+
+    _refresh_pool.submit(run)
+
+
+def get_trends(geo: str, limit: int = 20, keep: Optional[ItemFilter] = None) -> Dict[str, Any]:
+    """
+    Trending topics for a geo from the shared, revalidating cache.
+
+    A fresh cache entry is served as-is. A stale one is served immediately
+    while a conditional GET (If-None-Match / If-Modified-Since) refreshes it in
+    the background. Only a cold geo waits for the network. The RSS body is
+    parsed incrementally and only as far as needed for `limit` items.
+
+    Args:
+        geo: Country/region code used by Google Trends RSS (e.g., "US").
+        limit: Maximum number of trends to return.
+        keep: Optional item filter; items it rejects don't count toward `limit`.
+
+    Returns:
+        Dict with geo, updated, count and trends ({title, link, published}).
+
+    Raises:
+        requests.RequestException: If a cold fetch fails.
+        xml.etree.ElementTree.ParseError: If the RSS body is malformed.
+    """
+    geo = geo.upper().strip()
+
+    entry = _CACHE.get(geo)
+    if entry is None:
+        stale = _CACHE.get_stale(geo)
+        if stale is not None:
+            _count("stale_served")
+            _refresh_in_background(geo, stale)
+            entry = stale
+        else:
+            entry = _load(geo, None)
+
+    parsed: Parsed = entry["parsed"]
+    trends = _select(parsed, limit, keep)
+    if trends is None:
+        try:
+            parsed = _parse(entry, limit, keep)
+        except ET.ParseError:
+            _CACHE.pop(geo)  # don't keep serving a broken body
+            raise
+        trends = _select(parsed, limit, keep) or []
+
+    return {"geo": geo, "updated": parsed[0], "count": len(trends), "trends": trends}
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {**_stats, "refreshing": len(_refreshing)}
@@ -1,20 +1,20 @@
 from __future__ import annotations
 
+import contextvars
 import os
 import re
 import sys
 import json
 import time
-import xml.etree.ElementTree as ET
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import requests
 import tweepy as tw
 from dotenv import load_dotenv, find_dotenv
 
-_TWEET_CACHE: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
-_TWEET_CACHE_TTL_S = 20 * 60
+TWEET_CACHE_TTL_S = 20 * 60
+"""Freshness window of the per-topic tweet cache (seconds)."""
 
 
 def _load_environment() -> None:
@@ -58,10 +58,12 @@ PARENT_DIR = THIS_DIR.parent
 if str(PARENT_DIR) not in sys.path:
     sys.path.insert(0, str(PARENT_DIR))
 
-from ai_engine import get_ai_image_probability, scan_post_caption
-
-TRENDS_RSS_URL = "https://trends.google.com/trending/rss"
-DEFAULT_UA = "HackNC-State2026/1.0 (contact: you@example.com)"
+from inference_scheduler import image_probabilities, scan_captions
+import query_variants
+from src.cache import TTLCache
+from src.metrics import STAGE_SECONDS, X_SEARCH_DENIED, X_SEARCH_SECONDS, X_VARIANT_RESULTS
+from src.rate_limit import GovernedClient, governor
+from src.trends import get_trends
 
 X_BEARER = (
     os.getenv("X_BEARER_TOKEN")
@@ -70,10 +72,50 @@ X_BEARER = (
     or os.getenv("bear")
 )
 
-client_v2 = tw.Client(bearer_token=X_BEARER, wait_on_rate_limit=True) if X_BEARER else None
+# Never sleeps on 429s; the rate-limit governor decides which topics still get to call.
+client_v2 = GovernedClient(bearer_token=X_BEARER) if X_BEARER else None
+SEARCH_ROUTE = "/2/tweets/search/recent"
+"""X API route of recent search, as keyed in the rate-limit governor's windows."""
+
+# Max trend topics searched (and scored) at once across the whole process: the
+# pool is shared by every concurrent get_posts_from_trends_as_real_tweets call
+X_SEARCH_CONCURRENCY = int(os.getenv("SLOPCHOP_X_SEARCH_CONCURRENCY", "4"))
+_TOPIC_POOL = ThreadPoolExecutor(max_workers=X_SEARCH_CONCURRENCY, thread_name_prefix="x-topic")
+
+
+def _submit_topic(fn: Callable[..., Any], *args: Any) -> Future:
+    """Run on the topic pool in a copy of the caller's context, so a rate_limit.call_budget still applies."""
+    return _TOPIC_POOL.submit(contextvars.copy_context().run, fn, *args)
+
+
+# "per_topic": one search (plus variant fallbacks) per trend topic.
+# "batched": trend topics OR-packed into as few searches as fit the query-length
+# limit, tweets assigned back to topics by text; only uncovered topics fall back.
+X_SEARCH_MODE = os.getenv("SLOPCHOP_X_SEARCH_MODE", "per_topic").lower()
+if X_SEARCH_MODE not in ("per_topic", "batched"):
+    raise ValueError(f"SLOPCHOP_X_SEARCH_MODE must be 'per_topic' or 'batched', got {X_SEARCH_MODE!r}")
+X_QUERY_MAX_LEN = int(os.getenv("SLOPCHOP_X_QUERY_MAX_LEN", "512"))
+X_BATCH_MAX_RESULTS = 100
+_BATCH_QUERY_SUFFIX = " has:media lang:en -is:retweet"
+
+# Last-good tweets per topic; stale entries stay around as a fallback for upstream errors.
+_TWEET_CACHE: TTLCache[List[Dict[str, Any]]] = TTLCache.from_env(
+    "tweets", ttl_s=TWEET_CACHE_TTL_S, stale_ttl_s=2 * 60 * 60, max_entries=2000, max_bytes=16 * 1024 * 1024
+)
+_IMG_PROB_CACHE: TTLCache[float] = TTLCache.from_env(
+    "img_prob", ttl_s=24 * 60 * 60, max_entries=20000, max_bytes=8 * 1024 * 1024
+)
+# Failed downloads / classifications, so a dead url is not refetched on every build
+_IMG_FAILED_CACHE: TTLCache[float] = TTLCache.from_env(
+    "img_prob_failed", ttl_s=5 * 60, max_entries=5000, max_bytes=1024 * 1024
+)
+_CAPTION_SCAN_CACHE: TTLCache[Tuple[int, str]] = TTLCache.from_env(
+    "caption_scan", ttl_s=24 * 60 * 60, max_entries=20000, max_bytes=32 * 1024 * 1024
+)
 
-_IMG_PROB_CACHE: Dict[str, float] = {}
-_CAPTION_SCAN_CACHE: Dict[str, Tuple[int, str]] = {}
+_X_SEARCH_STAGE = STAGE_SECONDS.labels("x_topic_search")
+_CAPTION_STAGE = STAGE_SECONDS.labels("caption_scoring")
+_IMAGE_STAGE = STAGE_SECONDS.labels("image_scoring")
 
 
 def _obj_to_dict(o: Any) -> Dict[str, Any]:
@@ -112,29 +154,6 @@ def _obj_to_dict(o: Any) -> Dict[str, Any]:
     return {}
 
 
-def _local_name(tag: str) -> str:
-    """Return XML element local name, stripping namespace if present."""
-    return tag.rsplit("}", 1)[-1] if tag else ""
-
-
-def _first_child_by_local_name(parent: ET.Element, name: str) -> Optional[ET.Element]:
-    for child in list(parent):
-        if _local_name(child.tag) == name:
-            return child
-    return None
-
-
-def _children_by_local_name(parent: ET.Element, name: str) -> List[ET.Element]:
-    return [child for child in list(parent) if _local_name(child.tag) == name]
-
-
-def _child_text_by_local_name(parent: ET.Element, name: str) -> Optional[str]:
-    child = _first_child_by_local_name(parent, name)
-    if child is None or child.text is None:
-        return None
-    return child.text
-
-
 def _is_probably_english(s: str) -> bool:
     """Cheap filter to keep output English-ish."""
     if not s:
@@ -162,142 +181,231 @@ def _normalize_scan_result(scan_result: Any) -> Tuple[int, str]:
     return max(0, min(100, risk_score)), flag
 
 
-def _ai_prob_for_url(image_url: str) -> float:
-    """Call your image detector with caching; clamp [0,1]."""
-    if image_url in _IMG_PROB_CACHE:
-        return _IMG_PROB_CACHE[image_url]
-    try:
-        p = float(get_ai_image_probability(image_url))
-    except Exception:
-        p = 0.0
-    p = max(0.0, min(1.0, p))
-    _IMG_PROB_CACHE[image_url] = p
-    return p
+def _ai_probs_for_urls(image_urls: List[str]) -> List[float]:
+    """
+    Call your image detector with caching; uncached urls go in one batch; clamp [0,1].
+    Images that fail to download or classify score 0.0 and are only remembered
+    briefly (_IMG_FAILED_CACHE), so they are retried instead of hiding a real score.
+    """
+    known: Dict[str, float] = {}
+    for u in dict.fromkeys(image_urls):
+        p = _IMG_PROB_CACHE.get(u)
+        if p is None:
+            p = _IMG_FAILED_CACHE.get(u)
+        if p is not None:
+            known[u] = p
+
+    missing = [u for u in dict.fromkeys(image_urls) if u not in known]
+    if missing:
+        try:
+            probs = image_probabilities(missing, default=None)
+        except Exception:
+            probs = [None] * len(missing)
+        for url, p in zip(missing, probs):
+            try:
+                p = max(0.0, min(1.0, float(p)))
+            except Exception:
+                known[url] = 0.0
+                _IMG_FAILED_CACHE.set(url, 0.0)
+                continue
+            known[url] = p
+            _IMG_PROB_CACHE.set(url, p)
+    return [known[u] for u in image_urls]
 
 
-def _scan_caption(caption: str) -> Tuple[int, str]:
-    """Call your caption scanner with caching."""
-    if caption in _CAPTION_SCAN_CACHE:
-        return _CAPTION_SCAN_CACHE[caption]
-    try:
-        res = scan_post_caption(caption)
-    except Exception:
-        res = {}
-    out = _normalize_scan_result(res)
-    _CAPTION_SCAN_CACHE[caption] = out
-    return out
+def _scan_captions(captions: List[str]) -> List[Tuple[int, str]]:
+    """Call your caption scanner with caching; uncached captions go in one batch."""
+    known: Dict[str, Tuple[int, str]] = {}
+    for c in dict.fromkeys(captions):
+        hit = _CAPTION_SCAN_CACHE.get(c)
+        if hit is not None:
+            known[c] = hit
+
+    missing = [c for c in dict.fromkeys(captions) if c not in known]
+    if missing:
+        try:
+            results = scan_captions(missing)
+        except Exception:
+            results = [{}] * len(missing)
+        for caption, res in zip(missing, results):
+            known[caption] = _normalize_scan_result(res)
+            _CAPTION_SCAN_CACHE.set(caption, known[caption])
+    return [known[c] for c in captions]
 
 
 def get_google_trend_topics(geo: str = "US", limit: int = 10) -> Dict[str, Any]:
     """
-    Fetch Google Trends RSS and return titles (topics) in your preferred style.
+    Return up to `limit` English-looking trend topics for a geo.
+    Fetching, caching and parsing are shared with /trends in src.trends.
     """
-    headers = {
-        "User-Agent": os.getenv("USER_AGENT", DEFAULT_UA),
-        "Accept": "application/rss+xml, application/xml, text/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
-    r = requests.get(
-        TRENDS_RSS_URL,
-        params={"geo": geo.upper().strip(), "hl": "en-US"},
-        headers=headers,
-        timeout=15,
-    )
-    r.raise_for_status()
+    return get_trends(geo, limit=limit, keep=lambda item: _is_probably_english(item["title"]))
+
+
+def _clean_topic(topic: str) -> str:
+    t_clean = re.sub(r"[^\w\s#@-]", " ", (topic or "").strip()).strip()
+    return re.sub(r"\s+", " ", t_clean)
+
+
+def _topic_phrase(t_clean: str) -> str:
+    return f"\"{t_clean}\"" if " " in t_clean else t_clean
+
+
+def _topic_query_variants(topic: str) -> List[Tuple[str, str]]:
+    """
+    Create (kind, query) variants from strict -> loose.
+    We still FILTER for media in code, so the query can be looser.
+    `kind` names the variant independently of the topic, for query_variants stats.
+    """
+    t_clean = _clean_topic(topic)
+    if not t_clean:
+        return []
+
+    phrase = _topic_phrase(t_clean)
+
+    variants = [
+        ("phrase:images:en", f"{phrase} has:images lang:en -is:retweet"),
+        ("terms:images:en", f"{t_clean} has:images lang:en -is:retweet"),
+        ("phrase:images", f"{phrase} has:images -is:retweet"),
+        ("terms:images", f"{t_clean} has:images -is:retweet"),
+        ("phrase:media:en", f"{phrase} has:media lang:en -is:retweet"),
+        ("terms:media:en", f"{t_clean} has:media lang:en -is:retweet"),
+        ("phrase:en", f"{phrase} lang:en -is:retweet"),
+        ("terms:en", f"{t_clean} lang:en -is:retweet"),
+    ]
+
+    # Single-token topics have phrase == terms; don't spend a call twice on the same query
+    seen: set[str] = set()
+    unique: List[Tuple[str, str]] = []
+    for kind, q in variants:
+        if q not in seen:
+            seen.add(q)
+            unique.append((kind, q))
+    return unique
 
-    root = ET.fromstring(r.text)
-    channel = _first_child_by_local_name(root, "channel")
 
-    updated = None
-    if channel is not None:
-        updated = (
-            _child_text_by_local_name(channel, "lastBuildDate")
-            or _child_text_by_local_name(channel, "pubDate")
-            or None
+def _search_recent(query: str, max_results: int, variant: str) -> Any:
+    """One recent-search call, timed per query `variant` (a variant kind or "batched")."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        resp = client_v2.search_recent_tweets(
+            query=query,
+            max_results=max_results,
+            expansions=["attachments.media_keys", "author_id"],
+            tweet_fields=["public_metrics", "attachments", "lang"],
+            user_fields=["username"],
+            media_fields=["url", "preview_image_url", "type", "media_key"],
         )
-        if updated:
-            updated = updated.strip()
+        outcome = "ok"
+        return resp
+    except tw.errors.TooManyRequests:
+        outcome = "rate_limited"
+        raise
+    finally:
+        X_SEARCH_SECONDS.labels(variant, outcome).observe(time.perf_counter() - started)
+
 
-    trends: List[Dict[str, Any]] = []
-    if channel is None:
-        return {"geo": geo.upper().strip(), "updated": updated, "count": 0, "trends": trends}
+def _media_tweets_from_response(resp: Any, topic: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """English tweets with an image from a search response, as {id, username, image_url, caption, likes}."""
+    tweets = resp.data or []
+    includes = resp.includes or {}
 
-    for item in _children_by_local_name(channel, "item"):
-        title = (_child_text_by_local_name(item, "title") or "").strip()
-        link = (_child_text_by_local_name(item, "link") or "").strip()
-        published = (_child_text_by_local_name(item, "pubDate") or "").strip() or None
+    users = {u.id: _obj_to_dict(u) for u in (includes.get("users") or [])}
 
-        if not _is_probably_english(title):
+    media_by_key: Dict[str, Dict[str, Any]] = {}
+    for m in (includes.get("media") or []):
+        md = _obj_to_dict(m)
+        mk = md.get("media_key")
+        if mk:
+            media_by_key[mk] = md
+
+    out: List[Dict[str, Any]] = []
+
+    for twt in tweets:
+        td = _obj_to_dict(twt)
+        tid = td.get("id")
+        text = (td.get("text") or "").strip()
+
+        if text and not _is_probably_english(text):
             continue
 
-        trends.append({"title": title, "link": link, "published": published})
-        if len(trends) >= limit:
-            break
+        attachments = td.get("attachments") or {}
+        media_keys = attachments.get("media_keys") or []
+        if not media_keys:
+            continue
 
-    return {"geo": geo.upper().strip(), "updated": updated, "count": len(trends), "trends": trends}
+        image_url = None
 
+        for mk in media_keys:
+            md = media_by_key.get(mk) or {}
+            if (md.get("type") or "").lower() == "photo" and md.get("url"):
+                image_url = md["url"]
+                break
 
-def _topic_query_variants(topic: str) -> List[str]:
-    """
-    Create query variants from strict -> loose.
-    We still FILTER for media in code, so the query can be looser.
-    """
-    t = (topic or "").strip()
-    if not t:
-        return []
+        if not image_url:
+            for mk in media_keys:
+                md = media_by_key.get(mk) or {}
+                image_url = md.get("url") or md.get("preview_image_url")
+                if image_url:
+                    break
 
-    t_clean = re.sub(r"[^\w\s#@-]", " ", t).strip()
-    t_clean = re.sub(r"\s+", " ", t_clean)
+        if not image_url:
+            continue
 
-    phrase = f"\"{t_clean}\"" if " " in t_clean else t_clean
+        author_id = td.get("author_id")
+        username = (users.get(author_id, {}) or {}).get("username") or "unknown"
 
-    return [
-        f"{phrase} has:images lang:en -is:retweet",
-        f"{t_clean} has:images lang:en -is:retweet",
-        f"{phrase} has:images -is:retweet",
-        f"{t_clean} has:images -is:retweet",
-        f"{phrase} has:media lang:en -is:retweet",
-        f"{t_clean} has:media lang:en -is:retweet",
-        f"{phrase} lang:en -is:retweet",
-        f"{t_clean} lang:en -is:retweet",
-    ]
+        metrics = td.get("public_metrics") or {}
+        like_count = int(metrics.get("like_count") or 0)
 
+        out.append(
+            {
+                "id": str(tid),
+                "username": username,
+                "image_url": image_url,
+                "caption": text or topic,
+                "likes": like_count,
+            }
+        )
+
+        if limit is not None and len(out) >= limit:
+            break
 
-def search_x_tweets_with_media(topic: str, per_topic: int = 2) -> List[Dict[str, Any]]:
+    return out
+
+
+def search_x_tweets_with_media(topic: str, per_topic: int = 2, priority: int = 0) -> List[Dict[str, Any]]:
     """
     Return up to `per_topic` REAL tweets that contain media for a topic.
 
     - No fake x.com/search fallbacks.
     - On transient failures, returns cached last-good results for this topic (if any).
+    - `priority` is the topic's trend rank (0 = hottest). When the X rate-limit
+      budget is too low for that rank, returns stale results (or nothing)
+      right away instead of waiting for the window to reset.
     """
     if client_v2 is None:
         return []
 
-    now = time.time()
-
-    cached = _TWEET_CACHE.get(topic)
-    if cached and (now - cached[0] < _TWEET_CACHE_TTL_S) and cached[1]:
-        return cached[1][:per_topic]
+    fresh = _TWEET_CACHE.get(topic)
+    if fresh:
+        return fresh[:per_topic]
+    stale = _TWEET_CACHE.get_stale(topic)
 
     last_error: Optional[Exception] = None
 
-    for q in _topic_query_variants(topic):
+    # Most productive variants for this kind of topic first; barren ones skipped
+    shape = query_variants.topic_shape(topic)
+    for kind, q in query_variants.stats.order(shape, _topic_query_variants(topic)):
         for attempt in range(3):
+            if not governor.try_acquire(SEARCH_ROUTE, priority):
+                X_SEARCH_DENIED.inc()
+                return stale[:per_topic] if stale else []
             try:
-                resp = client_v2.search_recent_tweets(
-                    query=q,
-                    max_results=25,
-                    expansions=["attachments.media_keys", "author_id"],
-                    tweet_fields=["public_metrics", "attachments", "lang"],
-                    user_fields=["username"],
-                    media_fields=["url", "preview_image_url", "type", "media_key"],
-                )
+                resp = _search_recent(q, max_results=25, variant=kind)
                 break
-            except tw.errors.TooManyRequests as e:
-                last_error = e
-                if cached and cached[1]:
-                    return cached[1][:per_topic]
-                raise
+            except tw.errors.TooManyRequests:
+                return stale[:per_topic] if stale else []
             except (tw.errors.Unauthorized, tw.errors.Forbidden):
                 raise
             except Exception as e:
@@ -310,81 +418,160 @@ def search_x_tweets_with_media(topic: str, per_topic: int = 2) -> List[Dict[str,
         if resp is None:
             continue
 
-        tweets = resp.data or []
-        includes = resp.includes or {}
+        out = _media_tweets_from_response(resp, topic, limit=per_topic)
+
+        query_variants.stats.record(shape, kind, hit=bool(out))
+        X_VARIANT_RESULTS.labels(kind, "hit" if out else "empty").inc()
+
+        if out:
+            _TWEET_CACHE.set(topic, out)
+            return out[:per_topic]
 
-        users = {u.id: _obj_to_dict(u) for u in (includes.get("users") or [])}
+    if stale:
+        return stale[:per_topic]
 
-        media_by_key: Dict[str, Dict[str, Any]] = {}
-        for m in (includes.get("media") or []):
-            md = _obj_to_dict(m)
-            mk = md.get("media_key")
-            if mk:
-                media_by_key[mk] = md
+    if last_error:
+        raise last_error
 
-        out: List[Dict[str, Any]] = []
+    return []
 
-        for twt in tweets:
-            td = _obj_to_dict(twt)
-            tid = td.get("id")
-            text = (td.get("text") or "").strip()
 
-            if text and not _is_probably_english(text):
-                continue
+def _pack_topic_queries(topics: List[str]) -> List[Tuple[List[str], str]]:
+    """
+    Greedily pack topics, in order, into OR queries no longer than X_QUERY_MAX_LEN.
 
-            attachments = td.get("attachments") or {}
-            media_keys = attachments.get("media_keys") or []
-            if not media_keys:
-                continue
+    Returns (topics, query) pairs. Topics too long to share a query are left
+    out and go through the per-topic search.
+    """
+    packed: List[Tuple[List[str], str]] = []
+    group: List[str] = []
+    terms: List[str] = []
 
-            image_url = None
+    def query_for(ts: List[str]) -> str:
+        return f"({' OR '.join(ts)}){_BATCH_QUERY_SUFFIX}"
 
-            for mk in media_keys:
-                md = media_by_key.get(mk) or {}
-                if (md.get("type") or "").lower() == "photo" and md.get("url"):
-                    image_url = md["url"]
-                    break
+    for topic in topics:
+        t_clean = _clean_topic(topic)
+        if not t_clean:
+            continue
+        term = _topic_phrase(t_clean)
+        if len(query_for(terms + [term])) <= X_QUERY_MAX_LEN:
+            group.append(topic)
+            terms.append(term)
+            continue
+        if group:
+            packed.append((group, query_for(terms)))
+        group, terms = [], []
+        if len(query_for([term])) <= X_QUERY_MAX_LEN:
+            group, terms = [topic], [term]
 
-            if not image_url:
-                for mk in media_keys:
-                    md = media_by_key.get(mk) or {}
-                    image_url = md.get("url") or md.get("preview_image_url")
-                    if image_url:
-                        break
+    if group:
+        packed.append((group, query_for(terms)))
+    return packed
 
-            if not image_url:
-                continue
 
-            author_id = td.get("author_id")
-            username = (users.get(author_id, {}) or {}).get("username") or "unknown"
+def _topic_pattern(topic: str) -> "re.Pattern[str]":
+    """Matches the topic's words in order, allowing any separators (or none, as in hashtags)."""
+    words = _clean_topic(topic).lower().lstrip("#@").split()
+    return re.compile(r"(?<!\w)" + r"[\W_]*".join(re.escape(w) for w in words) + r"(?!\w)", re.IGNORECASE)
 
-            metrics = td.get("public_metrics") or {}
-            like_count = int(metrics.get("like_count") or 0)
 
-            out.append(
-                {
-                    "id": str(tid),
-                    "username": username,
-                    "image_url": image_url,
-                    "caption": text or topic,
-                    "likes": like_count,
-                }
-            )
+def _search_topic_batch(topics: List[str], query: str, per_topic: int, priority: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Run one OR-packed search and split its tweets among `topics` (earlier topics first)."""
+    if not governor.try_acquire(SEARCH_ROUTE, priority):
+        X_SEARCH_DENIED.inc()
+        return {}
+    try:
+        resp = _search_recent(query, max_results=X_BATCH_MAX_RESULTS, variant="batched")
+    except (tw.errors.Unauthorized, tw.errors.Forbidden):
+        raise
+    except Exception as e:
+        # Covered topics are simply none; they fall back to per-topic searches
+        print(f"Batched X search failed for {len(topics)} topics: {e}")
+        return {}
 
-            if len(out) >= per_topic:
+    patterns = [(topic, _topic_pattern(topic)) for topic in topics]
+    assigned: Dict[str, List[Dict[str, Any]]] = {}
+    for hit in _media_tweets_from_response(resp, ""):
+        if not hit["caption"]:
+            continue
+        for topic, pattern in patterns:
+            bucket = assigned.setdefault(topic, [])
+            if len(bucket) < per_topic and pattern.search(hit["caption"]):
+                bucket.append(hit)
                 break
 
-        if out:
-            _TWEET_CACHE[topic] = (now, out)
-            return out[:per_topic]
+    covered = {topic: hits for topic, hits in assigned.items() if hits}
+    for topic, hits in covered.items():
+        _TWEET_CACHE.set(topic, hits)
+    return covered
 
-    if cached and cached[1]:
-        return cached[1][:per_topic]
 
-    if last_error:
-        raise last_error
+def search_topics_batched(topics: List[str], per_topic: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Search many topics with as few OR-combined queries as possible.
 
-    return []
+    Topics with fresh cached tweets are not searched again. Returns the tweets
+    found per topic; topics missing from the result were not covered and
+    should go through `search_x_tweets_with_media`.
+    """
+    if client_v2 is None:
+        return {}
+
+    found: Dict[str, List[Dict[str, Any]]] = {}
+    pending: List[str] = []
+    for topic in topics:
+        fresh = _TWEET_CACHE.get(topic)
+        if fresh:
+            found[topic] = fresh[:per_topic]
+        elif topic not in pending:
+            pending.append(topic)
+
+    rank = {topic: i for i, topic in enumerate(topics)}
+    batches = _pack_topic_queries(pending)
+    futures = [
+        _submit_topic(_search_topic_batch, ts, query, per_topic, min(rank[t] for t in ts)) for ts, query in batches
+    ]
+    for fut in futures:
+        found.update(fut.result())
+    return found
+
+
+def _score_hits(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Score searched tweets into post dicts."""
+    if not hits:
+        return []
+
+    with _CAPTION_STAGE.time():
+        scans = _scan_captions([h["caption"] for h in hits])
+    with _IMAGE_STAGE.time():
+        ai_probs = _ai_probs_for_urls([h["image_url"] for h in hits])
+
+    posts: List[Dict[str, Any]] = []
+    for h, (risk_score, flag), ai_prob in zip(hits, scans, ai_probs):
+        image_url = h["image_url"]
+        risk_score = max(risk_score, int(round(ai_prob * 100)))
+
+        posts.append(
+            {
+                "id": h["id"],
+                "username": h["username"],
+                "image_url": image_url,
+                "caption": h["caption"],
+                "likes": int(h["likes"]),
+                "risk_score": risk_score,
+                "ai_image_probability": ai_prob,
+                "flag": flag,
+            }
+        )
+    return posts
+
+
+def _search_and_score_topic(topic: str, per_topic: int, priority: int = 0) -> List[Dict[str, Any]]:
+    """Search one topic and score its tweets into post dicts."""
+    with _X_SEARCH_STAGE.time():
+        hits = search_x_tweets_with_media(topic, per_topic=per_topic, priority=priority)
+    return _score_hits(hits)
 
 
 def get_posts_from_trends_as_real_tweets(
@@ -401,41 +588,41 @@ def get_posts_from_trends_as_real_tweets(
         "posts": [ {id, username, image_url, caption, likes, risk_score, ai_image_probability, flag}, ...]
       }
     """
-    trends_payload = get_google_trend_topics(geo=geo, limit=trends_count)
+    with STAGE_SECONDS.labels("trend_topics").time():
+        trends_payload = get_google_trend_topics(geo=geo, limit=trends_count)
+    topics = [ev["title"] for ev in trends_payload["trends"]]
+
+    # Batched mode: cover as many topics as possible with a few OR-packed searches first
+    batched = {}
+    if X_SEARCH_MODE == "batched":
+        with STAGE_SECONDS.labels("x_batched_search").time():
+            batched = search_topics_batched(topics, per_topic=tweets_per_trend)
+
+    # Search every remaining topic concurrently; each topic's tweets are scored
+    # as soon as its search returns (the scheduler batches scoring across topics).
+    # Trend rank is the rate-limit priority: the hottest topics get the last calls.
+    futures = [
+        _submit_topic(_score_hits, batched[topic])
+        if topic in batched
+        else _submit_topic(_search_and_score_topic, topic, tweets_per_trend, rank)
+        for rank, topic in enumerate(topics)
+    ]
 
     posts: List[Dict[str, Any]] = []
     seen_ids: set[str] = set()
 
-    for ev in trends_payload["trends"]:
-        topic = ev["title"]
-        hits = search_x_tweets_with_media(topic, per_topic=tweets_per_trend)
-
-        for h in hits:
-            tid = h["id"]
-            if tid in seen_ids:
-                continue
-            seen_ids.add(tid)
-
-            image_url = h["image_url"]
-            caption = h["caption"]
-
-            ai_prob = _ai_prob_for_url(image_url)
-            risk_score, flag = _scan_caption(caption)
-
-            risk_score = max(risk_score, int(round(ai_prob * 100)))
-
-            posts.append(
-                {
-                    "id": tid,
-                    "username": h["username"],
-                    "image_url": image_url,
-                    "caption": caption,
-                    "likes": int(h["likes"]),
-                    "risk_score": risk_score,
-                    "ai_image_probability": ai_prob,
-                    "flag": flag,
-                }
-            )
+    # Assemble in topic order so output and id dedup match a serial run.
+    try:
+        for fut in futures:
+            for post in fut.result():
+                if post["id"] in seen_ids:
+                    continue
+                seen_ids.add(post["id"])
+                posts.append(post)
+    except Exception:
+        for fut in futures:
+            fut.cancel()
+        raise
 
     return {
         "geo": trends_payload["geo"],
@@ -0,0 +1,90 @@
+import pytest
+
+from src import cache
+from src.cache import TTLCache
+
+
+@pytest.fixture
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_fresh_then_stale_then_gone(fake_time):
+    c = TTLCache("test_ttl", ttl_s=10, stale_ttl_s=5)
+    c.set("k", "v")
+    assert c.get("k") == "v"
+
+    fake_time.advance(10)
+    assert c.get("k") is None
+    assert "k" not in c
+    assert c.get_stale("k") == "v"
+    assert c.stats()["stale_hits"] == 1
+
+    fake_time.advance(5)
+    assert c.get_stale("k") is None
+
+
+def test_expired_entries_are_swept_on_write(fake_time):
+    c = TTLCache("test_sweep", ttl_s=10)
+    c.set("a", 1)
+    c.set("b", 2)
+    fake_time.advance(11)
+    c.set("c", 3)
+    assert len(c) == 1
+    assert c.stats()["expirations"] == 2
+
+
+def test_no_ttl_never_expires(fake_time):
+    c = TTLCache("test_no_ttl", ttl_s=None)
+    c.set("k", "v")
+    fake_time.advance(10 ** 9)
+    assert c.get("k") == "v"
+
+
+def test_entry_budget_evicts_least_recently_used():
+    c = TTLCache("test_lru", max_entries=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # "b" is now the least recently used
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_oldest_until_it_fits():
+    c = TTLCache("test_bytes", max_bytes=100, sizeof=lambda obj: 40 if isinstance(obj, str) and len(obj) > 1 else 0)
+    c.set("a", "xx")
+    c.set("b", "yy")
+    assert c.stats()["bytes"] == 80
+    c.set("c", "zz")
+    assert c.get("a") is None
+    assert c.get("b") == "yy" and c.get("c") == "zz"
+    assert c.stats()["bytes"] == 80
+
+
+def test_replacing_a_key_keeps_the_byte_count_exact():
+    c = TTLCache("test_replace", sizeof=lambda obj: len(obj) if isinstance(obj, str) else 0)
+    c.set(1, "aaaa")
+    c.set(1, "bb")
+    assert c.stats()["bytes"] == 2
+    assert c.pop(1) == "bb"
+    assert c.stats()["bytes"] == 0
+
+
+def test_hit_and_miss_counters():
+    c = TTLCache("test_counters")
+    c.set("k", "v")
+    c.get("k")
+    c.get("missing")
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_from_env_overrides(monkeypatch):
+    monkeypatch.setenv("SLOPCHOP_CACHE_TEST_ENV_MAX_ENTRIES", "3")
+    monkeypatch.setenv("SLOPCHOP_CACHE_TEST_ENV_TTL_S", "none")
+    c = TTLCache.from_env("test_env", ttl_s=60, max_entries=100)
+    assert c.max_entries == 3
+    assert c.ttl_s is None
@@ -0,0 +1,74 @@
+import pytest
+
+from caption_dedup import NearDuplicateIndex, normalize_caption
+from image_hash import PerceptualHashIndex, is_informative
+
+CAPTION = "Just landed in Lisbon and the sunset over the river is unreal tonight"
+
+
+def test_caption_normalization_drops_urls_mentions_and_amounts():
+    assert normalize_caption("WOW @bob look https://t.co/x $1,299!!") == "wow look <num>"
+
+
+def test_caption_exact_and_near_duplicate_hits():
+    index = NearDuplicateIndex(min_similarity=0.75)
+    index.add(CAPTION, 0.9)
+    assert index.lookup(CAPTION.upper() + " https://t.co/abc") == 0.9
+    assert index.lookup(CAPTION + " wow") == 0.9  # 12 of 13 distinct words shared
+    assert index.lookup("Quarterly earnings beat expectations across every segment this year") is None
+    stats = index.stats()
+    assert (stats["exact_hits"], stats["near_hits"]) == (1, 1)
+
+
+def test_short_captions_only_match_exactly():
+    index = NearDuplicateIndex(min_similarity=0.5)
+    index.add("so good", 0.2)
+    assert index.lookup("so good!") == 0.2
+    assert index.lookup("so good today") is None
+
+
+def test_caption_index_drops_the_oldest_entries():
+    index = NearDuplicateIndex(max_entries=2)
+    index.add("first caption", 0.1)
+    index.add("second caption", 0.2)
+    index.add("third caption", 0.3)
+    assert index.lookup("first caption") is None
+    assert index.lookup("third caption") == 0.3
+    assert index.stats()["entries"] == 2
+
+
+H = 0x0F0F_3C3C_AAAA_5555
+
+
+def test_phash_hits_within_max_hamming_only():
+    index = PerceptualHashIndex(max_hamming=4)
+    index.add(H, 0.7)
+    assert index.lookup(H) == 0.7
+    assert index.lookup(H ^ 0b1011) == 0.7  # 3 bits off
+    assert index.lookup(H ^ 0b11111) is None  # 5 bits off
+
+
+def test_phash_prefers_the_closest_hash():
+    index = PerceptualHashIndex(max_hamming=4)
+    index.add(H ^ 0b111, 0.1)
+    index.add(H ^ 0b1, 0.9)
+    assert index.lookup(H) == 0.9
+
+
+def test_phash_eviction_removes_band_entries():
+    index = PerceptualHashIndex(max_hamming=2, max_entries=1)
+    index.add(H, 0.5)
+    index.add(~H & (2 ** 64 - 1), 0.6)
+    assert index.lookup(H ^ 1) is None
+    assert index._bands and all(H not in members for members in index._bands.values())
+
+
+def test_phash_rejects_unsafe_hamming_radius():
+    with pytest.raises(ValueError):
+        PerceptualHashIndex(max_hamming=8)
+
+
+def test_flat_images_are_not_informative():
+    assert not is_informative(0)
+    assert not is_informative(2 ** 64 - 1)
+    assert is_informative(H)
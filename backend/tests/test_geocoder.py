@@ -0,0 +1,81 @@
+import pytest
+
+from src import googleapi
+from src.geocoder import ReverseGeocoder, geocoder, geohash
+
+# (lat, lon) -> Trends geo; the border and coast ones are the cases the
+# simplified outlines used to get wrong
+KNOWN_POINTS = {
+    "London": ((51.51, -0.13), "GB"),
+    "Barcelona": ((41.39, 2.17), "ES"),
+    "Tokyo": ((35.68, 139.69), "JP"),
+    "Sao Paulo": ((-23.55, -46.63), "BR"),
+    "Hong Kong": ((22.32, 114.17), "HK"),
+    "San Juan": ((18.47, -66.10), "PR"),
+    "New York": ((40.71, -74.00), "US"),
+    "Honolulu": ((21.31, -157.86), "US"),
+    "Anchorage": ((61.20, -149.90), "US"),
+    "Key West": ((24.55, -81.78), "US"),
+    "Outer Banks": ((35.56, -75.47), "US"),
+    "El Paso": ((31.76, -106.49), "US"),
+    "Ciudad Juarez": ((31.69, -106.42), "MX"),
+    "Laredo": ((27.51, -99.51), "US"),
+    "Nuevo Laredo": ((27.48, -99.52), "MX"),
+    "San Diego": ((32.72, -117.16), "US"),
+    "Tijuana": ((32.51, -117.04), "MX"),
+    "Detroit": ((42.33, -83.05), "US"),
+    "Windsor": ((42.30, -83.02), "CA"),
+    "Buffalo": ((42.89, -78.88), "US"),
+    "Fort Erie": ((42.90, -78.94), "CA"),
+    "Seattle": ((47.60, -122.33), "US"),
+    "Victoria": ((48.43, -123.37), "CA"),
+    "Calais ME": ((45.18, -67.28), "US"),
+    "Saint John NB": ((45.27, -66.06), "CA"),
+}
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(googleapi, "CENSUS_FALLBACK", False)
+    monkeypatch.setattr(googleapi, "_coords_are_in_us", lambda lat, lon: pytest.fail("no network lookups"))
+
+
+@pytest.mark.parametrize("name", sorted(KNOWN_POINTS))
+def test_known_points_resolve_offline(name):
+    (lat, lon), geo = KNOWN_POINTS[name]
+    assert googleapi.coords_to_geo(lat, lon) == geo
+
+
+def test_point_just_across_a_border_lists_the_neighbour():
+    geo, near = geocoder.lookup_detail(42.33, -83.05)  # Detroit, across the river from Windsor
+    assert geo == "US"
+    assert near[0] == "CA"
+
+
+def test_open_ocean_is_no_geo():
+    assert geocoder.lookup(0.0, -140.0) is None
+    with pytest.raises(ValueError):
+        googleapi.coords_to_geo(0.0, -140.0)
+
+
+def test_out_of_range_coordinates():
+    with pytest.raises(ValueError):
+        geocoder.lookup(91.0, 0.0)
+    with pytest.raises(ValueError):
+        googleapi.coords_to_geo(0.0, 181.0)
+
+
+def test_smallest_containing_polygon_wins():
+    square = lambda x0, y0, x1, y1: [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]
+    g = ReverseGeocoder(None)
+    g._index({"type": "FeatureCollection", "features": [
+        {"properties": {"geo": "AA"}, "geometry": {"type": "Polygon", "coordinates": square(0, 0, 10, 10)}},
+        {"properties": {"ISO_A2": "bb"}, "geometry": {"type": "Polygon", "coordinates": square(4, 4, 6, 6)}},
+    ]})
+    assert g.lookup(5, 5) == "BB"
+    assert g.lookup(1, 1) == "AA"
+    assert g.lookup(-1, -1) is None
+
+
+def test_geohash_matches_the_reference_encoding():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
@@ -0,0 +1,81 @@
+import pytest
+
+from src import rate_limit
+from src.rate_limit import WINDOW_S, RateLimitGovernor, call_budget
+
+ROUTE = "/2/tweets/search/recent"
+
+
+@pytest.fixture
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def _headers(limit, remaining, reset_at):
+    return {"x-rate-limit-limit": str(limit), "x-rate-limit-remaining": str(remaining), "x-rate-limit-reset": str(reset_at)}
+
+
+def test_unknown_endpoint_is_granted():
+    gov = RateLimitGovernor()
+    assert gov.try_acquire(ROUTE, priority=5)
+
+
+def test_spends_remaining_calls_then_refuses(fake_time):
+    gov = RateLimitGovernor(reserve_per_rank=1)
+    gov.update_from_headers(ROUTE, _headers(10, 2, fake_time.now + 60))
+    assert gov.try_acquire(ROUTE)
+    assert gov.try_acquire(ROUTE)
+    assert not gov.try_acquire(ROUTE)
+    assert gov.snapshot()["windows"][ROUTE]["remaining"] == 0
+
+
+def test_priority_floor_keeps_the_last_calls_for_top_topics(fake_time):
+    gov = RateLimitGovernor(reserve_per_rank=1)
+    gov.update_from_headers(ROUTE, _headers(10, 3, fake_time.now + 60))
+    assert not gov.try_acquire(ROUTE, priority=3)  # needs more than 3 left
+    assert gov.try_acquire(ROUTE, priority=2)
+    assert not gov.try_acquire(ROUTE, priority=2)
+    assert gov.try_acquire(ROUTE, priority=1)
+    assert gov.try_acquire(ROUTE, priority=0)
+    assert not gov.try_acquire(ROUTE, priority=0)
+    assert gov.denied == 3
+
+
+def test_priority_floor_is_capped(fake_time):
+    gov = RateLimitGovernor(reserve_per_rank=1)
+    gov.update_from_headers(ROUTE, _headers(100, rate_limit.MAX_RESERVED_RANK + 1, fake_time.now + 60))
+    assert gov.try_acquire(ROUTE, priority=1000)
+
+
+def test_window_rollover_restores_the_limit_and_advances_reset(fake_time):
+    gov = RateLimitGovernor()
+    reset_at = fake_time.now + 60
+    gov.update_from_headers(ROUTE, _headers(10, 0, reset_at))
+    assert not gov.try_acquire(ROUTE)
+
+    fake_time.advance(60 + 2 * WINDOW_S + 1)  # several windows later
+    assert gov.try_acquire(ROUTE)
+    window = gov.snapshot()["windows"][ROUTE]
+    assert window["remaining"] == 9
+    assert window["reset_at"] == reset_at + 3 * WINDOW_S
+    assert window["reset_at"] > fake_time.now
+
+
+def test_mark_exhausted_without_reset_waits_a_full_window(fake_time):
+    gov = RateLimitGovernor()
+    gov.update_from_headers(ROUTE, _headers(10, 5, fake_time.now - 1))
+    gov.mark_exhausted(ROUTE, None)
+    assert not gov.try_acquire(ROUTE)
+    assert gov.snapshot()["windows"][ROUTE]["reset_at"] == fake_time.now + WINDOW_S
+
+
+def test_call_budget_caps_calls_inside_the_block():
+    gov = RateLimitGovernor()
+    with call_budget(2) as budget:
+        assert gov.try_acquire(ROUTE)
+        assert gov.try_acquire(ROUTE)
+        assert not gov.try_acquire(ROUTE)
+    assert budget.used == 2
+    assert gov.budget_denied == 1
+    assert gov.try_acquire(ROUTE)
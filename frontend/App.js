@@ -56,8 +56,10 @@ export default function App() {
       setLocation(locationData);
 
       try {
-        await axios.post(`${API_URL}/api/submit-location`, locationData);
+        // The feed is built in a background job; wait for it before loading the news
+        const submitted = await axios.post(`${API_URL}/api/submit-location`, locationData);
         console.log('Location sent');
+        await waitForJob(submitted.data.job_id);
       } catch (error) {
         console.log('Could not send location:', error.message);
       }
@@ -70,6 +72,18 @@ export default function App() {
     }
   };
 
+  const waitForJob = async (jobId, timeoutMs = 60000, intervalMs = 1000) => {
+    if (!jobId) return;
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const { data } = await axios.get(`${API_URL}/api/jobs/${jobId}`, { timeout: 10000 });
+      if (data.status === 'done') return;
+      if (data.status === 'failed') throw new Error(data.error || 'Feed build failed');
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    console.log('Feed build still running, loading what is available');
+  };
+
   const loadData = async (lat = null, lon = null) => {
     try {
       if (demoMode) {